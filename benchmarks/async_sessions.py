@@ -0,0 +1,167 @@
+"""
+Concurrent sessions per process: sync vs async graph under one event loop.
+
+The server drives the graph with ainvoke. Sync nodes then run on the loop's
+thread pool and hold a thread for the whole LLM call, so a turn needs a free
+thread; async nodes await the LLM gateway and retrieval and hold none. For each
+session count, this replays the scripted conversations in
+benchmarks/conversations.jsonl as that many concurrent sessions on one event
+loop, against both flavours, and reports turns/s, turn latency and the most LLM
+calls in flight at once (the sync flavour cannot exceed the pool size).
+
+The chat model is `FakeChatModel` at a realistic latency and embeddings are
+hashed bag-of-words vectors. The gateway's concurrency and rate limits are
+lifted (they model provider quotas, not this process), and the answer cache is
+disabled, so every inquiry waits on the LLM.
+
+    python -m benchmarks.async_sessions --sessions 16 64 256 512 --llm-latency 1.0
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GOOGLE_API_KEY", "stub-key-for-benchmark")
+
+from benchmarks.run_benchmark import CORPUS_PATH, load_corpus, make_workdir
+
+
+class InFlight:
+    """Counts LLM calls in progress and the peak since the last reset."""
+
+    def __init__(self):
+        self.current = self.peak = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.current -= 1
+
+    def reset(self):
+        with self._lock:
+            self.peak = self.current
+
+
+def counting_model(in_flight, **kwargs):
+    from src.fake_llm import FakeChatModel
+
+    class CountingChatModel(FakeChatModel):
+        def _generate(self, *args, **kw):
+            with in_flight.track():
+                return super()._generate(*args, **kw)
+
+        async def _agenerate(self, *args, **kw):
+            with in_flight.track():
+                return await super()._agenerate(*args, **kw)
+
+    return CountingChatModel(**kwargs)
+
+def setup(args, in_flight):
+    """Builds the index once and both graph flavours on it. Returns {flavour: graph}."""
+    from benchmarks.stub_llm import StubEmbeddingManager
+    from src import llm as llm_module
+    from src.config import KNOWLEDGE_BASE_PATH
+    from src.vector_store import init_vector_db
+    from src.retriever import RAGRetriever
+    from src.graph import build_graph
+    from src.answer_cache import SemanticAnswerCache
+
+    llm_module.set_llm(counting_model(in_flight, latency=args.llm_latency, jitter=args.jitter, seed=args.seed))
+    llm_module.gateway = llm_module.LLMGateway(max_concurrency=args.llm_concurrency, rate_per_second=None)
+
+    db, embedding_manager = init_vector_db(KNOWLEDGE_BASE_PATH, backend='numpy',
+                                           embedding_manager=StubEmbeddingManager())
+    retriever = RAGRetriever(db, embedding_manager)
+    # A similarity above 1 never matches: no inquiry is served from the cache
+    return {flavour: build_graph(retriever, answer_cache=SemanticAnswerCache(path=None, threshold=1.01),
+                                 async_nodes=flavour == 'async')
+            for flavour in ('sync', 'async')}
+
+async def run_session(graph, thread_id, turns, latencies):
+    from langchain_core.messages import HumanMessage
+
+    config = {'configurable': {'thread_id': thread_id}}
+    for message in turns:
+        start = time.perf_counter()
+        await graph.ainvoke({'messages': [HumanMessage(message)]}, config)
+        latencies.append(time.perf_counter() - start)
+
+async def measure(graph, flavour, sessions, corpus, threads, run, in_flight):
+    from src.tracing import percentile
+
+    # The pool sync nodes (and the checkpointer) run on, as in a server process
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f'{flavour}-node'))
+
+    in_flight.reset()
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(graph, f"{flavour}-{run}-{i}", corpus[i % len(corpus)]['turns'], latencies)
+        for i in range(sessions)
+    ))
+    elapsed = time.perf_counter() - start
+
+    ms = [s * 1000 for s in latencies]
+    return {'flavour': flavour, 'sessions': sessions, 'turns': len(ms), 'seconds': elapsed,
+            'turns_per_s': len(ms) / elapsed, 'p50_ms': percentile(ms, 50), 'p95_ms': percentile(ms, 95),
+            'peak_llm_calls': in_flight.peak}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[16, 64, 256, 512], help="concurrent sessions per level")
+    # What asyncio gives the server's default executor, unless told otherwise
+    parser.add_argument('--threads', type=int, default=min(32, (os.cpu_count() or 1) + 4),
+                        help="thread pool size of the event loop (default: asyncio's)")
+    parser.add_argument('--llm-latency', type=float, default=1.0, help="stub LLM latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.2, help="uniform +/- jitter on the stub latency")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--llm-concurrency', type=int, default=100000, help="gateway in-flight limit")
+    parser.add_argument('--flavours', nargs='+', default=['sync', 'async'], choices=['sync', 'async'])
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--output', default=None, help="results JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    workdir = make_workdir()
+    os.chdir(workdir)
+    try:
+        in_flight = InFlight()
+        graphs = setup(args, in_flight)
+        print(f"{os.cpu_count()} CPUs, {args.threads} pool threads, stub LLM {args.llm_latency * 1000:.0f} ms\n")
+        print(f"{'flavour':<8} {'sessions':>8} {'turns':>6} {'seconds':>8} {'turns/s':>8} {'p50 ms':>8} "
+              f"{'p95 ms':>8} {'LLM peak':>9}")
+        results = []
+        for run, sessions in enumerate(args.sessions):
+            for flavour in args.flavours:
+                result = asyncio.run(measure(graphs[flavour], flavour, sessions, corpus, args.threads, run, in_flight))
+                results.append(result)
+                print(f"{flavour:<8} {sessions:>8} {result['turns']:>6} {result['seconds']:>8.2f} "
+                      f"{result['turns_per_s']:>8.1f} {result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} "
+                      f"{result['peak_llm_calls']:>9}")
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'cpus': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
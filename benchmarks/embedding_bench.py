@@ -0,0 +1,67 @@
+"""
+Query-embedding throughput under concurrency: micro-batching and the LRU cache.
+
+N threads each embed a stream of queries through `EmbeddingManager.embed_query`,
+first with batching off (max batch 1, no wait) and then with the configured
+batch size and wait. Reports queries/s, CPU ms per query (process time), encode
+calls and the average batch size; a final pass repeats the queries to show the
+cache hit rate.
+
+    python -m benchmarks.embedding_bench --threads 1 8 32 --queries 50
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import EMBED_MAX_BATCH, EMBED_BATCH_WAIT_MS
+from src.vector_store import EmbeddingManager
+
+TOPICS = ['engine', 'torque', 'warranty', 'refund', 'top speed', 'ABS', 'tyres', 'delivery', 'price', 'colours',
+          'test drive', 'cancellation', 'mileage', 'weight', 'seat height', 'charging port']
+
+
+def queries_for(thread, count):
+    return [f"what about the {TOPICS[(thread + i) % len(TOPICS)]} of the bullet 650, question {thread}-{i}?"
+            for i in range(count)]
+
+def run(manager, threads, count):
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda t: [manager.embed_query(q) for q in queries_for(t, count)], range(threads)))
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    return threads * count / wall, cpu * 1000 / (threads * count)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--queries', type=int, default=50, help="queries per thread")
+    parser.add_argument('--max-batch', type=int, default=EMBED_MAX_BATCH)
+    parser.add_argument('--wait-ms', type=float, default=EMBED_BATCH_WAIT_MS)
+    parser.add_argument('--stub-embeddings', action='store_true', help="hashed vectors instead of the model")
+    args = parser.parse_args()
+
+    if args.stub_embeddings:
+        from benchmarks.stub_llm import StubEmbeddingManager as Manager
+    else:
+        Manager = EmbeddingManager
+
+    print(f"{'threads':>7} {'mode':>9} {'queries/s':>10} {'cpu ms/q':>9} {'encodes':>8} {'avg batch':>10}")
+    for threads in args.threads:
+        for mode, max_batch, wait_ms in [('single', 1, 0), ('batched', args.max_batch, args.wait_ms)]:
+            manager = Manager(max_batch=max_batch, batch_wait_ms=wait_ms)
+            manager.warm_up()
+            rate, cpu = run(manager, threads, args.queries)
+            metrics = manager.metrics()
+            print(f"{threads:>7} {mode:>9} {rate:>10.1f} {cpu:>9.2f} {metrics['batches']:>8} {metrics['avg_batch_size']:>10.1f}")
+
+    # Repeat the last run's queries: every one should now come from the cache
+    rate, cpu = run(manager, args.threads[-1], args.queries)
+    print(f"\nRepeated queries: {rate:.0f} queries/s, cache hit rate {manager.metrics()['cache_hit_rate']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Load test for the HTTP server against a stub LLM.
+
+Starts `src.server:app` in-process with the Gemini client replaced by a stub that
+sleeps for a fixed latency, then drives it with an increasing number of concurrent
+sessions and reports throughput (turns/s) for each level.
+
+    python -m benchmarks.load_test --sessions 1 2 4 8 16 --turns 4 --llm-latency 0.5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "stub-key-for-load-test")
+
+import uvicorn
+from src.llm import set_llm
+from src.server import app
+from src.fake_llm import FakeChatModel
+
+SCRIPT = [
+    "hello",
+    "what is the top speed of the bullet 650?",
+    "what does the warranty cover?",
+    "i want to book a test drive",
+]
+
+
+def post_chat(base_url, session_id, message):
+    body = json.dumps({'session_id': session_id, 'message': message}).encode('utf-8')
+    request = urllib.request.Request(f"{base_url}/chat", data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+def run_session(base_url, session_id, turns):
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        post_chat(base_url, session_id, SCRIPT[i % len(SCRIPT)])
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def start_server(port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.1)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--turns', type=int, default=4, help="turns per session")
+    parser.add_argument('--llm-latency', type=float, default=0.5, help="stub LLM latency in seconds")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    set_llm(FakeChatModel(latency=args.llm_latency))
+    server = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    print(f"{'sessions':>8} {'turns':>6} {'seconds':>8} {'turns/s':>8} {'p50 ms':>8} {'max ms':>8}")
+    for run, sessions in enumerate(args.sessions):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            results = list(pool.map(
+                lambda i: run_session(base_url, f"load-{run}-{i}", args.turns), range(sessions)
+            ))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(l for session in results for l in session)
+        print(f"{sessions:>8} {len(latencies):>6} {elapsed:>8.2f} {len(latencies) / elapsed:>8.2f} "
+              f"{latencies[len(latencies) // 2] * 1000:>8.0f} {latencies[-1] * 1000:>8.0f}")
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
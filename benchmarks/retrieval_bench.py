@@ -0,0 +1,137 @@
+"""
+Retrieval quality, context size and latency: dense-only vs hybrid (BM25 + dense,
+reciprocal rank fusion) at a fixed k, and adaptive hybrid retrieval (score-gap cut,
+sections merged, context token budget).
+
+Indexes policy_documents in a throwaway directory and runs every question in
+benchmarks/retrieval_questions.jsonl through `RAGRetriever` in each mode. A chunk
+counts as relevant when its file and section number match one of the question's
+labels. Reports hit rate and recall at k, MRR, chunks and context tokens per
+question (as formatted for the inquiry prompt) and per-query latency.
+
+The "followup" mode asks the questions in file order as one thread: a question
+reuses the previous retrieval when `RAGRetriever.covers` says its chunks suffice,
+as the inquiry node does, and the reuse rate is reported.
+
+Uses the real embedding model by default; --stub-embeddings swaps in hashed
+bag-of-words vectors for a run with no model download (dense scores are then
+only a rough stand-in).
+
+    python -m benchmarks.retrieval_bench --top-k 5
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUESTIONS_PATH = os.path.join(ROOT, 'benchmarks', 'retrieval_questions.jsonl')
+
+
+def is_relevant(chunk, labels) -> bool:
+    metadata = chunk['metadata']
+    return any(metadata.get('file_source') == source and str(metadata.get('section_header', '')).startswith(section)
+               for source, section in labels)
+
+def evaluate(retriever, questions, top_k, followup=False):
+    from src.tracing import percentile
+    from src.retriever import format_chunks
+    from src.context import count_tokens
+
+    hits, recall, reciprocal_ranks, latencies = 0, 0.0, 0.0, []
+    chunk_counts, context_tokens, reused, previous = 0, 0, 0, None
+    for question in questions:
+        # Queries reach the retriever as chat-history lines
+        query = f"human: {question['question']}"
+        start = time.perf_counter()
+        if followup:
+            embedding = retriever.embedding_manager.embed_query(question['question'])
+            if retriever.covers(previous, query, embedding):
+                chunks = previous['chunks']
+                reused += 1
+            else:
+                chunks = retriever.retrieve_chunks(query, top_k=top_k, query_embedding=embedding)
+                previous = {'embedding': embedding, 'chunks': chunks}
+        else:
+            chunks = retriever.retrieve_chunks(query, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        chunk_counts += len(chunks)
+        context_tokens += count_tokens(format_chunks(chunks))
+
+        relevant = [is_relevant(chunk, question['relevant']) for chunk in chunks]
+        if any(relevant):
+            hits += 1
+            reciprocal_ranks += 1 / (relevant.index(True) + 1)
+        found = {label for label in map(tuple, question['relevant'])
+                 if any(is_relevant(chunk, [label]) for chunk in chunks)}
+        recall += len(found) / len(question['relevant'])
+
+    n = len(questions)
+    return {'hit_rate': hits / n, 'recall': recall / n, 'mrr': reciprocal_ranks / n,
+            'chunks': chunk_counts / n, 'context_tokens': context_tokens / n, 'reuse_rate': reused / n,
+            'p50_ms': percentile(latencies, 50), 'p95_ms': percentile(latencies, 95)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--questions', default=QUESTIONS_PATH)
+    parser.add_argument('--backend', default='numpy', choices=['numpy', 'chroma'])
+    parser.add_argument('--stub-embeddings', action='store_true')
+    parser.add_argument('--output', default=None, help="results JSON")
+    args = parser.parse_args()
+
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+
+    workdir = tempfile.mkdtemp(prefix='retrieval-bench-')
+    shutil.copytree(os.path.join(ROOT, 'policy_documents'), os.path.join(workdir, 'policy_documents'))
+    os.chdir(workdir)
+    try:
+        from src.config import KNOWLEDGE_BASE_PATH
+        from src.vector_store import init_vector_db
+        from src.lexical_index import BM25Index
+        from src.retriever import RAGRetriever
+
+        embedding_manager = None
+        if args.stub_embeddings:
+            from benchmarks.stub_llm import StubEmbeddingManager
+            embedding_manager = StubEmbeddingManager()
+        db, embedding_manager = init_vector_db(KNOWLEDGE_BASE_PATH, backend=args.backend,
+                                               embedding_manager=embedding_manager)
+
+        # No similarity floor, so the fixed modes return k chunks and are compared on ranking alone
+        lexical_index = BM25Index()
+        fixed = dict(min_cosine=None, adaptive=False)
+        adaptive = RAGRetriever(db, embedding_manager, lexical_index=lexical_index)
+        modes = {
+            'dense': (RAGRetriever(db, embedding_manager, hybrid=False, **fixed), False),
+            'hybrid': (RAGRetriever(db, embedding_manager, lexical_index=lexical_index, **fixed), False),
+            'adaptive': (adaptive, False),
+            'followup': (adaptive, True),
+        }
+        results = {name: evaluate(retriever, questions, args.top_k, followup)
+                   for name, (retriever, followup) in modes.items()}
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{len(questions)} questions, top_k={args.top_k}\n")
+    print(f"{'mode':<9} {'hit@k':>7} {'recall@k':>9} {'MRR':>6} {'chunks':>7} {'ctx tok':>8} {'reused':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    for name, result in results.items():
+        print(f"{name:<9} {result['hit_rate']:>7.3f} {result['recall']:>9.3f} {result['mrr']:>6.3f} "
+              f"{result['chunks']:>7.2f} {result['context_tokens']:>8.1f} {result['reuse_rate']:>7.1%} "
+              f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'questions': len(questions), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Offline end-to-end benchmark of the conversation graph.
+
+Replays the scripted conversations in benchmarks/conversations.jsonl through
+`build_graph` with Gemini replaced by `FakeChatModel` (fixed or jittered latency,
+canned outputs) and the embedding model replaced by hashed bag-of-words vectors.
+Runs in a throwaway working directory with no network and no API key.
+
+Reports:
+  - startup time (imports, index build, graph build) in a fresh interpreter
+  - per-turn latency, overall and by routed intent
+  - prompt tokens per turn, and how many of them a provider prefix cache could serve
+  - throughput at each level of concurrent sessions
+  - memory growth per session (tracemalloc)
+
+Results are written as JSON so runs can be compared with --baseline.
+
+    python -m benchmarks.run_benchmark --sessions 1 4 16 --llm-latency 0.3 --output results.json
+    python -m benchmarks.run_benchmark --baseline results.json
+"""
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GOOGLE_API_KEY", "stub-key-for-benchmark")
+
+CORPUS_PATH = os.path.join(ROOT, 'benchmarks', 'conversations.jsonl')
+
+
+def load_corpus(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def make_workdir():
+    # Fresh index, checkpoints, caches and traces for every run
+    workdir = tempfile.mkdtemp(prefix='sales-agent-bench-')
+    shutil.copytree(os.path.join(ROOT, 'policy_documents'), os.path.join(workdir, 'policy_documents'))
+    shutil.copytree(os.path.join(ROOT, 'resource'), os.path.join(workdir, 'resource'))
+    return workdir
+
+def setup_graph(args):
+    """Imports the app, builds the index and graph with the stubs. Returns (graph, llm, templates, timings)."""
+    timings = {}
+    start = time.perf_counter()
+    from benchmarks.stub_llm import StubEmbeddingManager
+    from src.fake_llm import FakeChatModel
+    from src.llm import set_llm
+    from src.config import KNOWLEDGE_BASE_PATH
+    from src.vector_store import init_vector_db
+    from src.retriever import RAGRetriever
+    from src.graph import build_graph
+    from src.response_templates import ResponseTemplates
+    timings['imports_s'] = time.perf_counter() - start
+
+    llm = FakeChatModel(latency=args.llm_latency, jitter=args.jitter, seed=args.seed,
+                        prefill_latency=args.prefill_latency)
+    set_llm(llm)
+
+    start = time.perf_counter()
+    db, embedding_manager = init_vector_db(KNOWLEDGE_BASE_PATH, backend=args.backend,
+                                           embedding_manager=StubEmbeddingManager())
+    timings['index_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    templates = ResponseTemplates(enabled=not args.no_templates)
+    graph = build_graph(RAGRetriever(db, embedding_manager), response_templates=templates)
+    timings['build_graph_s'] = time.perf_counter() - start
+    return graph, llm, templates, timings
+
+def run_conversation(graph, thread_id, turns):
+    # [(routed intent, seconds)] for each user message
+    from langchain_core.messages import HumanMessage
+
+    config = {'configurable': {'thread_id': thread_id}}
+    results = []
+    for message in turns:
+        start = time.perf_counter()
+        state = graph.invoke({'messages': [HumanMessage(message)]}, config)
+        results.append((state.get('user_intent') or 'unknown', time.perf_counter() - start))
+    return results
+
+def latency_stats(seconds):
+    from src.tracing import percentile
+
+    if not seconds:
+        return {}
+    ms = [s * 1000 for s in seconds]
+    return {'count': len(ms), 'mean_ms': sum(ms) / len(ms), 'p50_ms': percentile(ms, 50),
+            'p95_ms': percentile(ms, 95), 'max_ms': max(ms)}
+
+
+def measure_startup(args, workdir):
+    # A fresh interpreter, so import costs are not hidden by modules this process already loaded
+    command = [sys.executable, '-m', 'benchmarks.run_benchmark', '--startup-probe', '--backend', args.backend]
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))}
+    start = time.perf_counter()
+    output = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['process_s'] = time.perf_counter() - start
+    return timings
+
+def measure_turn_latency(graph, llm, corpus):
+    by_intent, every_turn = {}, []
+    calls, input_tokens, cached_tokens = llm.calls, llm.input_tokens, llm.cached_tokens
+    for conversation in corpus:
+        for intent, seconds in run_conversation(graph, f"latency-{conversation['id']}", conversation['turns']):
+            by_intent.setdefault(intent, []).append(seconds)
+            every_turn.append(seconds)
+    # Sequential turns, so the counters cover exactly this pass
+    input_tokens, cached_tokens = llm.input_tokens - input_tokens, llm.cached_tokens - cached_tokens
+    tokens = {'llm_calls': llm.calls - calls, 'input_per_turn': input_tokens / len(every_turn),
+              'cached_per_turn': cached_tokens / len(every_turn),
+              'uncached_per_turn': (input_tokens - cached_tokens) / len(every_turn)}
+    return {'overall': latency_stats(every_turn), 'tokens': tokens,
+            'by_intent': {intent: latency_stats(values) for intent, values in sorted(by_intent.items())}}
+
+def measure_throughput(graph, corpus, sessions, run):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(pool.map(
+            lambda i: run_conversation(graph, f"load-{run}-{i}", corpus[i % len(corpus)]['turns']), range(sessions)
+        ))
+    elapsed = time.perf_counter() - start
+
+    seconds = [s for conversation in results for _, s in conversation]
+    return {'sessions': sessions, 'turns': len(seconds), 'seconds': elapsed,
+            'turns_per_s': len(seconds) / elapsed, 'conversations_per_s': sessions / elapsed,
+            **{k: v for k, v in latency_stats(seconds).items() if k != 'count'}}
+
+def measure_memory(graph, llm, corpus, sessions):
+    # LLM latency does not change what is retained, so skip it to keep this quick
+    latency, llm.latency, llm.jitter = llm.latency, 0.0, 0.0
+    try:
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(sessions):
+            run_conversation(graph, f"memory-{i}", corpus[i % len(corpus)]['turns'])
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        llm.latency = latency
+    return {'sessions': sessions, 'growth_kb': (current - before) / 1024,
+            'per_session_kb': (current - before) / 1024 / sessions, 'peak_kb': peak / 1024}
+
+
+def compare(results, baseline):
+    rows = [('startup process s', ('startup', 'process_s')),
+            ('turn p50 ms', ('turn_latency', 'overall', 'p50_ms')),
+            ('turn p95 ms', ('turn_latency', 'overall', 'p95_ms')),
+            ('input tokens/turn', ('turn_latency', 'tokens', 'input_per_turn')),
+            ('uncached tokens/turn', ('turn_latency', 'tokens', 'uncached_per_turn')),
+            ('memory per session kb', ('memory', 'per_session_kb'))]
+    rows += [(f"turns/s @{level['sessions']}", ('throughput', i, 'turns_per_s'))
+             for i, level in enumerate(results['throughput'])]
+
+    def lookup(data, path):
+        for key in path:
+            try:
+                data = data[key]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return data
+
+    print(f"\n{'metric':<24} {'baseline':>10} {'current':>10} {'change':>8}")
+    for label, path in rows:
+        old, new = lookup(baseline, path), lookup(results, path)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else '-'
+        print(f"{label:<24} {old:>10.2f} {new:>10.2f} {change:>8}")
+
+def print_report(results):
+    startup = results['startup']
+    print(f"Startup: {startup['process_s']:.2f}s total (imports {startup['imports_s']:.2f}s, "
+          f"index {startup['index_s']:.2f}s, graph {startup['build_graph_s']:.2f}s)")
+
+    print(f"\n{'intent':<10} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for intent, stats in [('all', results['turn_latency']['overall']), *results['turn_latency']['by_intent'].items()]:
+        print(f"{intent:<10} {stats['count']:>6} {stats['p50_ms']:>8.0f} {stats['p95_ms']:>8.0f} {stats['max_ms']:>8.0f}")
+
+    tokens = results['turn_latency']['tokens']
+    print(f"\nPrompt tokens per turn: {tokens['input_per_turn']:.0f} input, {tokens['cached_per_turn']:.0f} "
+          f"from the prefix cache, {tokens['uncached_per_turn']:.0f} uncached ({tokens['llm_calls']} LLM calls)")
+
+    print(f"\n{'sessions':>8} {'turns':>6} {'seconds':>8} {'turns/s':>8} {'conv/s':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for level in results['throughput']:
+        print(f"{level['sessions']:>8} {level['turns']:>6} {level['seconds']:>8.2f} {level['turns_per_s']:>8.2f} "
+              f"{level['conversations_per_s']:>7.2f} {level['p50_ms']:>8.0f} {level['p95_ms']:>8.0f}")
+
+    templates = results['meta']['response_templates']
+    print(f"\nResponse templates: {templates['template']} template replies, {templates['llm']} LLM replies "
+          f"({templates['template_rate']:.0%} templated)")
+
+    memory = results['memory']
+    print(f"\nMemory: +{memory['growth_kb']:.0f} KB over {memory['sessions']} sessions "
+          f"({memory['per_session_kb']:.1f} KB/session, peak {memory['peak_kb']:.0f} KB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16], help="concurrent sessions per level")
+    parser.add_argument('--llm-latency', type=float, default=0.3, help="stub LLM latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="uniform +/- jitter on the stub latency")
+    parser.add_argument('--prefill-latency', type=float, default=0.0,
+                        help="stub LLM seconds per 1000 prompt tokens not served from the prefix cache")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memory-sessions', type=int, default=50)
+    parser.add_argument('--no-templates', action='store_true', help="LLM replies for every greeting and lead prompt")
+    parser.add_argument('--backend', default='numpy', choices=['numpy', 'chroma'])
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--output', default=None, help="results JSON (default: benchmark_<timestamp>.json)")
+    parser.add_argument('--baseline', default=None, help="earlier results JSON to compare against")
+    parser.add_argument('--startup-probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup_probe:
+        args.llm_latency, args.jitter, args.seed, args.prefill_latency = 0.0, 0.0, 0, 0.0
+        print(json.dumps(setup_graph(args)[3]))
+        return
+
+    corpus = load_corpus(args.corpus)
+    output = os.path.abspath(args.output or f"benchmark_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    workdir, probe_workdir = make_workdir(), make_workdir()
+    os.chdir(workdir)
+    try:
+        results = {
+            'meta': {'timestamp': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                     'platform': platform.platform(), 'args': {k: v for k, v in vars(args).items() if k != 'startup_probe'},
+                     'conversations': len(corpus)},
+            'startup': measure_startup(args, probe_workdir),
+        }
+        graph, llm, templates, _ = setup_graph(args)
+        results['turn_latency'] = measure_turn_latency(graph, llm, corpus)
+        results['throughput'] = [measure_throughput(graph, corpus, sessions, run) for run, sessions in enumerate(args.sessions)]
+        results['memory'] = measure_memory(graph, llm, corpus, args.memory_sessions)
+        results['meta']['llm_calls'] = llm.calls
+        results['meta']['response_templates'] = templates.metrics()
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+        shutil.rmtree(probe_workdir, ignore_errors=True)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print_report(results)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare(results, json.load(f))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
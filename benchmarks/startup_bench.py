@@ -0,0 +1,117 @@
+"""
+Cold-start breakdown: where the time goes between `python` and the first prompt.
+
+1. Imports the entry module in a fresh interpreter with `-X importtime` and ranks
+   packages by their own import time, plus every `src.*` module's cumulative time.
+2. Times each load phase in another fresh interpreter: vector index sync, graph
+   build, embedding model warm-up and LLM client creation. A phase that cannot run
+   here (e.g. the model is not cached and there is no network) is reported with its
+   error instead of a time.
+
+    python -m benchmarks.startup_bench --module src.server --top 15 --output startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_python(args, cwd):
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))}
+    env.setdefault('GOOGLE_API_KEY', 'stub-key-for-startup-bench')
+    return subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True)
+
+def import_breakdown(module, cwd):
+    start = time.perf_counter()
+    completed = run_python(['-X', 'importtime', '-c', f"import {module}"], cwd)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    packages, src_modules = {}, {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        top_level = name.split('.')[0]
+        packages[top_level] = packages.get(top_level, 0) + int(self_us)
+        if top_level == 'src':
+            src_modules[name] = int(cumulative_us)
+    return {'module': module, 'process_s': wall, 'total_import_ms': sum(packages.values()) / 1000,
+            'packages_ms': {name: us / 1000 for name, us in sorted(packages.items(), key=lambda item: -item[1])},
+            'src_modules_cumulative_ms': {name: us / 1000 for name, us in src_modules.items()}}
+
+def probe_phases():
+    # Runs inside the fresh interpreter; prints one JSON line of phase timings
+    phases = {}
+
+    def phase(name, func):
+        start = time.perf_counter()
+        try:
+            result = func()
+            phases[name] = {'seconds': time.perf_counter() - start}
+            return result
+        except Exception as e:
+            phases[name] = {'seconds': time.perf_counter() - start, 'error': repr(e)}
+
+    phase('import_src', lambda: __import__('src.graph'))
+    from src.config import KNOWLEDGE_BASE_PATH
+    from src.vector_store import init_vector_db
+    from src.retriever import RAGRetriever
+    from src.graph import build_graph
+    from src.llm import get_llm
+
+    loaded = phase('vector_index', lambda: init_vector_db(KNOWLEDGE_BASE_PATH))
+    if loaded:
+        db, embedding_manager = loaded
+        phase('build_graph', lambda: build_graph(RAGRetriever(db, embedding_manager)))
+        phase('embedding_warm_up', embedding_manager.warm_up)
+    phase('llm_client', get_llm)
+    print(json.dumps(phases))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='src.server', help="entry module to import")
+    parser.add_argument('--top', type=int, default=15, help="packages to list")
+    parser.add_argument('--workdir', default=ROOT, help="directory holding policy_documents and vector-db")
+    parser.add_argument('--output', default=None, help="results JSON")
+    parser.add_argument('--probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        probe_phases()
+        return
+
+    imports = import_breakdown(args.module, args.workdir)
+    print(f"import {args.module}: {imports['total_import_ms']:.0f} ms of imports "
+          f"({imports['process_s']:.2f}s including interpreter start)\n")
+    print(f"{'package':<32} {'self ms':>9}")
+    for name, ms in list(imports['packages_ms'].items())[:args.top]:
+        print(f"{name:<32} {ms:>9.1f}")
+    print(f"\n{'src module':<32} {'cumulative ms':>13}")
+    for name, ms in sorted(imports['src_modules_cumulative_ms'].items(), key=lambda item: -item[1]):
+        print(f"{name:<32} {ms:>13.1f}")
+
+    completed = run_python(['-m', 'benchmarks.startup_bench', '--probe'], args.workdir)
+    if completed.returncode != 0:
+        raise SystemExit(f"phase probe failed:\n{completed.stderr[-2000:]}")
+    phases = json.loads(completed.stdout.strip().splitlines()[-1])
+    print(f"\n{'phase':<32} {'seconds':>9}")
+    for name, result in phases.items():
+        note = f"  ({result['error']})" if 'error' in result else ''
+        print(f"{name:<32} {result['seconds']:>9.2f}{note}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'imports': imports, 'phases': phases}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Offline stand-ins for the SentenceTransformer model used by the benchmarks, so the
+graph can be benchmarked with no network and no API key. The chat model stand-in
+is `src.fake_llm.FakeChatModel`.
+
+- StubEmbeddingManager: an EmbeddingManager (same cache and batching) whose
+  encoder is deterministic hashed bag-of-words instead of a model.
+"""
+import re
+import hashlib
+import numpy as np
+from src.vector_store import EmbeddingManager
+
+
+class StubEmbeddingManager(EmbeddingManager):
+    """Hashed bag-of-words embeddings: same text, same vector, no model download."""
+
+    def __init__(self, model_name: str = 'stub-hash-384', dim: int = 384, **kwargs):
+        super().__init__(model_name, **kwargs)
+        self.dim = dim
+
+    def _load_model(self):
+        self.model = 'stub'
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % self.dim] += 1.0
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _encode(self, texts) -> np.ndarray:
+        return np.stack([self._embed(text) for text in texts])
@@ -0,0 +1,30 @@
+"""
+The HTTP server with stub models, for load tests with no network and no API key.
+
+The chat model is `FakeChatModel` (STUB_LLM_LATENCY seconds per call, default
+FAKE_LLM_LATENCY) and embeddings are hashed bag-of-words vectors. Everything else,
+checkpoints, locks, vector index and lead store, is the real thing, so it can be
+run with several workers:
+
+    MULTI_WORKER=true VECTOR_BACKEND=numpy uvicorn benchmarks.stub_server:app --workers 4
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import FAKE_LLM_LATENCY
+from src.fake_llm import FakeChatModel
+from src.llm import set_llm
+from src import server
+from benchmarks.stub_llm import StubEmbeddingManager
+
+set_llm(FakeChatModel(latency=float(os.getenv("STUB_LLM_LATENCY", FAKE_LLM_LATENCY))))
+
+
+def init_stub_vector_db(knowledge_base_path, embedding_manager=None, **kwargs):
+    return server_init_vector_db(knowledge_base_path, embedding_manager=embedding_manager or StubEmbeddingManager(),
+                                 **kwargs)
+
+server_init_vector_db, server.init_vector_db = server.init_vector_db, init_stub_vector_db
+app = server.app
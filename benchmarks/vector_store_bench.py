@@ -0,0 +1,97 @@
+"""
+Query latency and startup time of the vector store backends.
+
+Indexes N random unit vectors (MiniLM size, 384 dims) in the Chroma backend and
+the NumPy backend (float32 and int8), then times a cold open of each store and
+single and batched top-k queries against it. Chroma is skipped if it is not
+installed.
+
+    python -m benchmarks.vector_store_bench --sizes 100 1000 5000 --queries 200
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.numpy_store import NumpyVectorStore
+
+DIM = 384
+
+
+def random_corpus(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk-{i}" for i in range(n)]
+    return ids, vectors, [{'policy_type': 'Bench', 'chunk_id': i} for i in range(n)], [f"document {i}" for i in ids]
+
+def time_queries(store, queries, top_k, batch):
+    latencies = []
+    for start in range(0, len(queries), batch):
+        chunk = queries[start:start + batch].tolist()
+        t = time.perf_counter()
+        store.query(query_embeddings=chunk, n_results=top_k)
+        latencies.append((time.perf_counter() - t) / len(chunk))
+    return statistics.median(latencies) * 1000
+
+def bench_numpy(path, corpus, queries, args, quantize):
+    ids, vectors, metadatas, documents = corpus
+    NumpyVectorStore(path, quantize=quantize).upsert(ids, vectors, metadatas, documents)
+
+    t = time.perf_counter()
+    store = NumpyVectorStore(path, read_only=True)
+    startup = (time.perf_counter() - t) * 1000
+    return startup, time_queries(store, queries, args.top_k, 1), time_queries(store, queries, args.top_k, args.batch)
+
+def bench_chroma(path, corpus, queries, args):
+    import chromadb
+
+    ids, vectors, metadatas, documents = corpus
+    collection = chromadb.PersistentClient(path=path).get_or_create_collection('bench')
+    for start in range(0, len(ids), 1000):
+        end = start + 1000
+        collection.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                       metadatas=metadatas[start:end], documents=documents[start:end])
+    del collection
+
+    t = time.perf_counter()
+    store = chromadb.PersistentClient(path=path).get_collection('bench')
+    store.query(query_embeddings=[queries[0].tolist()], n_results=args.top_k)  # forces the HNSW index load
+    startup = (time.perf_counter() - t) * 1000
+    return startup, time_queries(store, queries, args.top_k, 1), time_queries(store, queries, args.top_k, args.batch)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=32, help="queries per batched call")
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        import chromadb  # noqa: F401
+        backends = ['chroma', 'numpy-f32', 'numpy-int8']
+    except ImportError:
+        print("chromadb not installed, benchmarking the NumPy backend only.")
+        backends = ['numpy-f32', 'numpy-int8']
+
+    print(f"{'backend':>11} {'chunks':>7} {'open ms':>8} {'query ms':>9} {'batched ms/q':>13}")
+    for size in args.sizes:
+        corpus = random_corpus(size)
+        queries = random_corpus(args.queries, seed=1)[1]
+        for backend in backends:
+            with tempfile.TemporaryDirectory() as path:
+                if backend == 'chroma':
+                    startup, single, batched = bench_chroma(path, corpus, queries, args)
+                else:
+                    startup, single, batched = bench_numpy(path, corpus, queries, args, backend == 'numpy-int8')
+            print(f"{backend:>11} {size:>7} {startup:>8.2f} {single:>9.3f} {batched:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
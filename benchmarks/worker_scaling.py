@@ -0,0 +1,131 @@
+"""
+Throughput of the HTTP server as the number of worker processes grows.
+
+For each worker count, starts `uvicorn benchmarks.stub_server:app --workers N`
+with MULTI_WORKER=true and VECTOR_BACKEND=numpy in a throwaway directory, then
+replays the scripted conversations from benchmarks/conversations.jsonl as
+concurrent sessions. Every request opens a new connection, so consecutive turns
+of a session land on whichever worker accepts them; sessions stay coherent only
+through the shared checkpoints and session locks. Reports turns/s,
+conversations/s, latency and captured leads (which should not change with the
+worker count).
+
+The stub LLM latency is low by default so that per-turn CPU work, which is what
+extra workers add capacity for, dominates.
+
+    python -m benchmarks.worker_scaling --workers 1 2 4 --sessions 64 --llm-latency 0.02
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CORPUS_PATH = os.path.join(ROOT, 'benchmarks', 'conversations.jsonl')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def post_chat(base_url, session_id, message):
+    body = json.dumps({'session_id': session_id, 'message': message}).encode('utf-8')
+    request = urllib.request.Request(f"{base_url}/chat", data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+def wait_ready(base_url, workers, timeout=120):
+    # /ready answers from whichever worker accepts, so wait for a run of successes
+    deadline, streak = time.time() + timeout, 0
+    while streak < 3 * workers:
+        if time.time() > deadline:
+            raise RuntimeError(f"Server at {base_url} did not become ready in {timeout}s")
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=5) as response:
+                streak = streak + 1 if response.status == 200 else 0
+        except (urllib.error.URLError, ConnectionError):
+            streak = 0
+            time.sleep(0.2)
+
+def run_session(base_url, session_id, turns):
+    latencies, lead_captured = [], False
+    for message in turns:
+        start = time.perf_counter()
+        lead_captured = post_chat(base_url, session_id, message)['lead_captured']
+        latencies.append(time.perf_counter() - start)
+    return latencies, lead_captured
+
+def measure(workers, args, corpus):
+    from src.tracing import percentile
+
+    workdir = tempfile.mkdtemp(prefix='worker-scaling-')
+    for folder in ('policy_documents', 'resource'):
+        shutil.copytree(os.path.join(ROOT, folder), os.path.join(workdir, folder))
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, 'MULTI_WORKER': 'true', 'VECTOR_BACKEND': 'numpy', 'STUB_LLM_LATENCY': str(args.llm_latency),
+           'PYTHONPATH': os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'benchmarks.stub_server:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(base_url, workers)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            results = list(pool.map(
+                lambda i: run_session(base_url, f"scale-{workers}-{i}", corpus[i % len(corpus)]['turns']),
+                range(args.sessions)
+            ))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    ms = [s * 1000 for latencies, _ in results for s in latencies]
+    return {'workers': workers, 'turns': len(ms), 'seconds': elapsed, 'turns_per_s': len(ms) / elapsed,
+            'conversations_per_s': args.sessions / elapsed, 'p50_ms': percentile(ms, 50),
+            'p95_ms': percentile(ms, 95), 'leads_captured': sum(captured for _, captured in results)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--sessions', type=int, default=64, help="concurrent sessions per run")
+    parser.add_argument('--llm-latency', type=float, default=0.02, help="stub LLM latency in seconds")
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--output', default=None, help="results JSON")
+    args = parser.parse_args()
+
+    with open(args.corpus, 'r', encoding='utf-8') as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    print(f"{os.cpu_count()} CPUs, {args.sessions} sessions, stub LLM {args.llm_latency * 1000:.0f} ms\n")
+    print(f"{'workers':>7} {'turns':>6} {'seconds':>8} {'turns/s':>8} {'conv/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'leads':>6}")
+    results = []
+    for workers in args.workers:
+        result = measure(workers, args, corpus)
+        results.append(result)
+        print(f"{workers:>7} {result['turns']:>6} {result['seconds']:>8.2f} {result['turns_per_s']:>8.1f} "
+              f"{result['conversations_per_s']:>7.2f} {result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} "
+              f"{result['leads_captured']:>6}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'cpus': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,20 @@
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, AIMessageChunk
 from src.config import KNOWLEDGE_BASE_PATH
 from src.vector_store import init_vector_db
 from src.custom_logger import logging
 from src.retriever import RAGRetriever
-from src.graph import build_graph
-from src.utils import save_lead_to_excel
+from src.graph import build_graph, STREAMED_NODES
+from src.utils import save_lead, clean_reply, ReplyStreamCleaner
+from src.llm import get_llm
 import sys
-import re
 import os
+import uuid
+import threading
+
+def warm_up(embedding_manager):
+    # Loads the embedding model and LLM client while the user types the first message
+    embedding_manager.warm_up()
+    get_llm()
 
 def main():
     # Initialize DB & Retriever
@@ -16,13 +23,16 @@ def main():
 
     # Build Graph
     graph = build_graph(retriever)
-    config = {"configurable": {"thread_id": "1"}}
+    threading.Thread(target=warm_up, args=(embedding_manager,), name='warm-up', daemon=True).start()
+    # Conversations are persisted, pass a session id to resume one: python main.py <session_id>
+    thread_id = sys.argv[1] if len(sys.argv) > 1 else uuid.uuid4().hex[:8]
+    config = {"configurable": {"thread_id": thread_id}}
 
-    print("AutoStream Bot Initialized. Type 'quit' to exit.",end='\n\n')
+    print(f"AutoStream Bot Initialized (session {thread_id}). Type 'quit' to exit.",end='\n\n')
     
     def mock_lead_capture(name, email, location):
         print(f"Lead captured successfully: {name}, {email}, {location}")
-        save_lead_to_excel({
+        save_lead({
             'name': name,
             'contact': email,
             'location': location})
@@ -36,20 +46,36 @@ def main():
             break
 
         state = {'messages': [HumanMessage(query)]}
-        result = graph.invoke(state, config=config)
+        
+        # Print reply tokens as they are generated; 'values' carries the final state
+        cleaner = ReplyStreamCleaner()
+        streamed = False
+        for mode, payload in graph.stream(state, config=config, stream_mode=["messages", "values"]):
+            if mode == "values":
+                result = payload
+                continue
+            chunk, metadata = payload
+            if metadata.get('langgraph_node') in STREAMED_NODES and isinstance(chunk, AIMessageChunk) \
+                    and isinstance(chunk.content, str) and chunk.content:
+                if not streamed:
+                    print('Bot:', end=' ', flush=True)
+                    streamed = True
+                print(cleaner.feed(chunk.content), end='', flush=True)
+        if streamed:
+            print(cleaner.flush(), end='\n\n')
         
         # Check for completion
         if result.get('user_data') and all(result['user_data'].values()):
-            print('Bot:', result['messages'][-1].content)
+            if not streamed:
+                print('Bot:', result['messages'][-1].content)
             captured_lead = result['user_data']
             mock_lead_capture(captured_lead['name'],captured_lead['contact'],captured_lead['location'])
             break
 
-        result_message = result['messages'][-1].content
-        result_message = re.sub(r"[\*\n\t]+", " ", result_message)
-        
-
-        print('Bot:',result_message ,end='\n\n')
+        # Replies that were not generated token by token (cached answers, extraction prompts)
+        if not streamed:
+            result_message = clean_reply(result['messages'][-1].content)
+            print('Bot:',result_message ,end='\n\n')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.custom_logger import logging
+from src.config import ANSWER_CACHE_PATH, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD
+
+# Stands in for the customer's name inside cached answers
+NAME_PLACEHOLDER = "<<customer_name>>"
+
+
+class SemanticAnswerCache:
+    """
+    Cache of generated inquiry answers keyed by query embedding.
+
+    A lookup hits when a cached query is at least `threshold` cosine-similar AND
+    was answered from exactly the same set of retrieved chunks. Chunk ids are
+    content hashes (see `chunk_ids_for`), so editing a source document changes
+    the ids and every answer built on the old text stops matching. Entries are
+    evicted LRU beyond `max_entries` and expire after `ttl` seconds.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, max_entries: int = ANSWER_CACHE_SIZE,
+                 ttl: float = ANSWER_CACHE_TTL, threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def _expire(self):
+        now = time.time()
+        for key in [k for k, e in self.entries.items() if now - e['created'] > self.ttl]:
+            del self.entries[key]
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def lookup(self, query_embedding, chunk_ids, name=None):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        chunk_set = frozenset(chunk_ids)
+
+        with self._lock:
+            self._expire()
+            candidates = [(k, e) for k, e in self.entries.items() if e['chunks'] == chunk_set]
+            best_key, best_score = None, -1.0
+            if candidates:
+                scores = np.stack([e['embedding'] for _, e in candidates]) @ query
+                i = int(np.argmax(scores))
+                best_key, best_score = candidates[i][0], float(scores[i])
+
+            if best_key is None or best_score < self.threshold:
+                self.stats['misses'] += 1
+                return None
+
+            self.stats['hits'] += 1
+            self.entries.move_to_end(best_key)
+            answer = self.entries[best_key]['answer']
+
+        logging.info(f"Answer cache hit (similarity {best_score:.3f}), hit rate {self.hit_rate:.0%}.")
+        # Light personalization: the cached answer addressed someone else by name
+        return answer.replace(NAME_PLACEHOLDER, name or "rider")
+
+    def store(self, query_embedding, chunk_ids, answer: str, name=None):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if name:
+            answer = answer.replace(name, NAME_PLACEHOLDER)
+
+        with self._lock:
+            self.entries[self._next_key] = {
+                'embedding': query / (np.linalg.norm(query) or 1.0),
+                'chunks': frozenset(chunk_ids),
+                'answer': answer,
+                'created': time.time()
+            }
+            self._next_key += 1
+            self._expire()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def metrics(self) -> dict:
+        return {**self.stats, 'hit_rate': self.hit_rate, 'entries': len(self.entries)}
+
+    def save(self):
+        with self._lock:
+            self._expire()
+            data = [
+                {'embedding': e['embedding'].tolist(), 'chunks': sorted(e['chunks']),
+                 'answer': e['answer'], 'created': e['created']}
+                for e in self.entries.values()
+            ]
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Per-process temp file: every server worker saves its cache at exit
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        logging.info(f"Saved {len(data)} cached answers to {self.path} (hits {self.stats['hits']}, misses {self.stats['misses']}).")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.info(f"Ignoring unreadable answer cache {self.path}: {e}")
+            return
+
+        for item in data:
+            self.entries[self._next_key] = {
+                'embedding': np.asarray(item['embedding'], dtype=np.float32),
+                'chunks': frozenset(item['chunks']),
+                'answer': item['answer'],
+                'created': item['created']
+            }
+            self._next_key += 1
+        self._expire()
+        logging.info(f"Loaded {len(self.entries)} cached answers from {self.path}.")
@@ -0,0 +1,267 @@
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from src.custom_logger import logging
+from src.config import CHECKPOINT_DB_PATH, SESSION_CACHE_SIZE, SESSION_IDLE_TTL, MULTI_WORKER
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SessionCheckpointer(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer backed by a local SQLite file.
+
+    Only the latest checkpoint of each thread is kept (older checkpoints and their
+    pending writes are compacted away on every put), so the file grows with the
+    number of sessions, not with the number of turns. Every write goes straight to
+    SQLite; a bounded LRU of serialized checkpoints keeps hot sessions in memory and
+    sessions idle for longer than `idle_ttl` seconds are dropped from it.
+    A restart resumes every conversation from the file.
+
+    With `shared` (several worker processes on one file) another process may have
+    advanced a thread since it was cached, so a cached row is only used while its
+    checkpoint id and write count still match the file.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB_PATH, max_sessions: int = SESSION_CACHE_SIZE,
+                 idle_ttl: float = SESSION_IDLE_TTL, serde=None, shared: bool = MULTI_WORKER):
+        super().__init__(serde=serde)
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.shared = shared
+        # (thread_id, checkpoint_ns) -> cached row, ordered from least to most recently used
+        self.cache = OrderedDict()
+        self.lock = threading.RLock()
+
+        # Writers in other worker processes queue on SQLite's lock instead of failing
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        logging.info(f"Session checkpointer using {path} (cache {max_sessions} sessions, idle TTL {idle_ttl}s"
+                     f"{', shared across workers' if shared else ''}).")
+
+    # ---- cache management ----
+
+    def _touch(self, key, row):
+        row['last_access'] = time.monotonic()
+        self.cache[key] = row
+        self.cache.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        # Oldest entries sit at the front, so stop at the first one still in use
+        now = time.monotonic()
+        while self.cache:
+            key, row = next(iter(self.cache.items()))
+            if len(self.cache) <= self.max_sessions and now - row['last_access'] < self.idle_ttl:
+                break
+            self.cache.popitem(last=False)
+
+    def _is_current(self, thread_id, checkpoint_ns, row) -> bool:
+        found = self.conn.execute(
+            "SELECT checkpoint_id, (SELECT COUNT(*) FROM writes w WHERE w.thread_id = c.thread_id "
+            "AND w.checkpoint_ns = c.checkpoint_ns AND w.checkpoint_id = c.checkpoint_id) "
+            "FROM checkpoints c WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns)
+        ).fetchone()
+        return found == (row['checkpoint_id'], len(row['writes']))
+
+    def _load_row(self, thread_id, checkpoint_ns):
+        key = (thread_id, checkpoint_ns)
+        row = self.cache.get(key)
+        if row is not None and (not self.shared or self._is_current(thread_id, checkpoint_ns, row)):
+            self._touch(key, row)
+            return row
+
+        found = self.conn.execute(
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns)
+        ).fetchone()
+        if found is None:
+            return None
+
+        checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = found
+        writes = self.conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        row = {
+            'checkpoint_id': checkpoint_id,
+            'parent_checkpoint_id': parent_id,
+            'checkpoint': (type_, checkpoint),
+            'metadata': (metadata_type, metadata),
+            'writes': {(task_id, idx): (channel, (t, v), path) for task_id, idx, channel, t, v, path in writes},
+        }
+        self._touch(key, row)
+        return row
+
+    def _to_tuple(self, thread_id, checkpoint_ns, row):
+        writes = sorted(row['writes'].items(), key=lambda kv: (kv[1][2], kv[0][0], kv[0][1]))
+        parent_id = row['parent_checkpoint_id']
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": row['checkpoint_id']
+            }},
+            checkpoint=self.serde.loads_typed(row['checkpoint']),
+            metadata=self.serde.loads_typed(row['metadata']),
+            pending_writes=[(task_id, channel, self.serde.loads_typed(value))
+                            for (task_id, _), (channel, value, _) in writes],
+            parent_config=({"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id
+            }} if parent_id else None),
+        )
+
+    # ---- BaseCheckpointSaver interface ----
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self.lock:
+            row = self._load_row(thread_id, checkpoint_ns)
+            if row is None:
+                return None
+            # Older checkpoints are compacted away; only the latest can be served
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id and checkpoint_id != row['checkpoint_id']:
+                return None
+            return self._to_tuple(thread_id, checkpoint_ns, row)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        with self.lock:
+            if config is not None:
+                thread_id = config["configurable"]["thread_id"]
+                namespaces = [config["configurable"]["checkpoint_ns"]] \
+                    if "checkpoint_ns" in config["configurable"] else \
+                    [ns for (ns,) in self.conn.execute(
+                        "SELECT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,))]
+                keys = [(thread_id, ns) for ns in namespaces]
+            else:
+                keys = self.conn.execute("SELECT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+
+            tuples = []
+            for thread_id, checkpoint_ns in keys:
+                row = self._load_row(thread_id, checkpoint_ns)
+                if row is None:
+                    continue
+                if before and get_checkpoint_id(before) and row['checkpoint_id'] >= get_checkpoint_id(before):
+                    continue
+                checkpoint_tuple = self._to_tuple(thread_id, checkpoint_ns, row)
+                if filter and any(checkpoint_tuple.metadata.get(k) != v for k, v in filter.items()):
+                    continue
+                tuples.append(checkpoint_tuple)
+
+        for checkpoint_tuple in tuples[:limit] if limit else tuples:
+            yield checkpoint_tuple
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        row = {
+            'checkpoint_id': checkpoint["id"],
+            'parent_checkpoint_id': parent_id,
+            'checkpoint': self.serde.dumps_typed(checkpoint),
+            'metadata': self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+            'writes': {},
+        }
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], parent_id, *row['checkpoint'], *row['metadata'], time.time())
+            )
+            # Compaction: writes of superseded checkpoints are never read again
+            self.conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+                (thread_id, checkpoint_ns, checkpoint["id"])
+            )
+            self.conn.commit()
+            self._touch((thread_id, checkpoint_ns), row)
+
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]
+        }}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self.lock:
+            row = self._load_row(thread_id, checkpoint_ns)
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                typed_value = self.serde.dumps_typed(value)
+                # Regular writes are idempotent per (task, idx); special writes overwrite
+                verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+                self.conn.execute(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, *typed_value, task_path)
+                )
+                if row is not None and row['checkpoint_id'] == checkpoint_id:
+                    if idx < 0 or (task_id, idx) not in row['writes']:
+                        row['writes'][(task_id, idx)] = (channel, typed_value, task_path)
+            self.conn.commit()
+
+    def delete_thread(self, thread_id):
+        with self.lock:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self.conn.commit()
+            for key in [key for key in self.cache if key[0] == thread_id]:
+                del self.cache[key]
+
+    # SQLite calls are short but still blocking, keep them off the event loop
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        tuples = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
@@ -3,17 +3,122 @@ from dotenv import load_dotenv
 from src.custom_logger import logging
 load_dotenv()
 
+# Several server worker processes on one host (uvicorn/gunicorn --workers N): sessions are
+# locked across processes, checkpoint reads are checked against SQLite instead of trusting
+# the in-process cache, and the vector index is synced by one worker at a time, then opened
+# read-only by all of them. Requires VECTOR_BACKEND=numpy (memory-mapped).
+MULTI_WORKER = os.getenv("MULTI_WORKER", "false").lower() == "true"
+
 VECTOR_DB_PATH = "./vector-db"
+MANIFEST_PATH = os.path.join(VECTOR_DB_PATH, "index_manifest.json")
 KNOWLEDGE_BASE_PATH = "./policy_documents"
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Vector index backend: "chroma" or "numpy" (exact in-process search, best for small corpora)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+INDEX_LOCK_PATH = os.path.join(VECTOR_DB_PATH, "index.lock")
+VECTOR_QUANTIZE = False     # numpy backend only: store int8 embeddings
+# Query embeddings: LRU cache size, and micro-batching of concurrent queries into one
+# encode call (largest batch, and how long the first query waits for company)
+EMBED_CACHE_SIZE = 2048
+EMBED_MAX_BATCH = 32
+EMBED_BATCH_WAIT_MS = 5
+
+# Hybrid retrieval: BM25 over the same chunks, fused with dense results by reciprocal rank
+HYBRID_RETRIEVAL = True
+BM25_INDEX_PATH = os.path.join(VECTOR_DB_PATH, "bm25_index.json")
+RRF_K = 60
+RETRIEVAL_CANDIDATES = 20   # dense and lexical candidates per query before fusion
+# Chunks below this cosine similarity to the query are dropped unless BM25 matched them strongly: with at
+# least RETRIEVAL_MIN_LEXICAL_MATCH of the query's term weight, so one shared common word is not enough; None disables
+RETRIEVAL_MIN_COSINE = 0.25
+RETRIEVAL_MIN_LEXICAL_MATCH = 0.4
+# Adaptive context: rank up to RETRIEVAL_MAX_K chunks, cut where the score falls more than
+# RETRIEVAL_SCORE_GAP (a fraction) below the best, merge chunks of the same section and
+# stop adding chunks at RETRIEVAL_CONTEXT_TOKENS
+RETRIEVAL_ADAPTIVE = True
+RETRIEVAL_MAX_K = 8
+RETRIEVAL_SCORE_GAP = 0.2
+RETRIEVAL_CONTEXT_TOKENS = 400
+# A follow-up reuses the thread's last retrieved chunks when they contain every term of the
+# question, or its embedding is at least this close (cosine) to the query that found them
+RETRIEVAL_REUSE_SIMILARITY = 0.85
+# Indexing: processes parsing/chunking documents (None = one per CPU) and chunks per embedding call
+INGEST_WORKERS = None
+EMBED_BATCH_SIZE = 64
 GEMINI_MODEL = "google_genai:gemini-2.0-flash"
 
-LEADS_FILE = "captured_leads.xlsx"
-LOG_DIR = 'chat_logs'
+# LLM provider: "gemini", or "fake" for canned offline replies (no API key needed)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+FAKE_LLM_LATENCY = 0.3
+
+# Register the static system prompts with Gemini context caching (billed storage, so off by
+# default); prompts under the API's minimum cacheable size are always sent inline
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+GEMINI_CONTEXT_CACHE_TTL = 3600
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = 1024
+
+# LLM gateway: concurrent outbound requests per process, request rate (None disables),
+# per-call timeout (seconds) and retries with jittered exponential backoff on 429/5xx
+LLM_MAX_CONCURRENCY = 8
+LLM_RATE_PER_SECOND = 30
+LLM_BURST = 30
+LLM_TIMEOUT = 30
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 8
+
+# Minimum confidence for the local intent classifier to skip the LLM call
+INTENT_FAST_PATH_THRESHOLD = 0.75
+
+# Run retrieval for the latest message in parallel with intent classification
+PREFETCH_RETRIEVAL = True
+PREFETCH_WORKERS = 4
+
+# Graph flavour served by the HTTP server: async nodes await the LLM gateway and retrieval,
+# so one event loop carries many sessions without a thread each. The CLI, batch replay and
+# benchmarks compile the sync flavour.
+ASYNC_GRAPH = True
+# Threads the async retriever runs vector search and BM25 on
+RETRIEVAL_WORKERS = 4
 
-logging.info("Configuration loaded successfully.")
+# Conversation context sent to the LLM: recent messages kept verbatim and their token budget
+CONTEXT_MAX_TURNS = 12
+CONTEXT_TOKEN_BUDGET = 1500
+
+# Conversation checkpoints: SQLite file, hot sessions kept in memory, idle eviction (seconds)
+CHECKPOINT_DB_PATH = "./checkpoints.sqlite3"
+SESSION_CACHE_SIZE = 1000
+SESSION_IDLE_TTL = 15 * 60
+# Cross-process session locks: byte-range locks on one file, thread_ids hashed onto stripes
+SESSION_LOCK_PATH = CHECKPOINT_DB_PATH + ".locks"
+SESSION_LOCK_STRIPES = 4096
+SESSION_LOCK_POLL_MAX = 0.1     # longest wait (seconds) between attempts on a lock another worker holds
+
+# Semantic cache of generated inquiry answers, persisted next to the vector DB
+ANSWER_CACHE_PATH = os.path.join(VECTOR_DB_PATH, "answer_cache.json")
+ANSWER_CACHE_SIZE = 500
+ANSWER_CACHE_TTL = 24 * 60 * 60
+ANSWER_CACHE_THRESHOLD = 0.92
+
+# Conversations replayed concurrently by the batch runner (python -m src.replay)
+REPLAY_WORKERS = 8
+
+# Pre-generated greeting and lead-prompt replies (build with: python -m src.response_templates build).
+# Messages with a question or more than RESPONSE_TEMPLATE_MAX_WORDS words still get an LLM reply.
+RESPONSE_TEMPLATES = True
+RESPONSE_TEMPLATES_PATH = os.path.join("resource", "response_templates.json")
+RESPONSE_TEMPLATE_MAX_WORDS = 12
+RESPONSE_TEMPLATE_VARIANTS = 6
+
+# How long a request arriving during server warm-up waits before getting a 503 (seconds)
+STARTUP_WAIT_TIMEOUT = 60
+
+LEADS_DB_PATH = "captured_leads.sqlite3"
+LEADS_FILE = "captured_leads.xlsx"     # on-demand export: python -m src.lead_store export
+LOG_DIR = 'chat_logs'
 
+# Per-node latency/token traces (JSONL, one span per line); summarize with: python -m src.tracing summarize
+TRACING_ENABLED = True
+TRACE_DIR = "traces"
 
-# Ensure API Key is set
-if not os.getenv("GOOGLE_API_KEY"):
-    raise ValueError("GOOGLE_API_KEY not found in environment variables")
\ No newline at end of file
+logging.info("Configuration loaded successfully.")
\ No newline at end of file
@@ -0,0 +1,55 @@
+from src.config import CONTEXT_MAX_TURNS, CONTEXT_TOKEN_BUDGET
+from src.state import State, get_chat_history
+
+
+def count_tokens(text: str) -> int:
+    # Rough estimate (~4 characters per token), good enough for budgeting prompts
+    return max(1, len(text) // 4)
+
+def recent_turns(lines: list, max_turns: int, token_budget: int) -> list:
+    """Newest lines that fit both the turn limit and the token budget, oldest first."""
+    kept, used = [], 0
+    for line in reversed(lines[-max_turns:]):
+        used += count_tokens(line)
+        if kept and used > token_budget:
+            break
+        kept.append(line)
+    return kept[::-1]
+
+def needs_summary(state: State) -> bool:
+    # True once the not-yet-summarized turns no longer fit the window
+    lines = get_chat_history(state)[state.get('summarized_upto', 0):]
+    return len(lines) > CONTEXT_MAX_TURNS or sum(count_tokens(l) for l in lines) > CONTEXT_TOKEN_BUDGET
+
+def turns_to_fold(state: State):
+    """
+    Splits off the older turns that should be folded into the rolling summary.
+    Keeps half the window verbatim so summarizing only happens every few turns.
+    Returns (lines_to_fold, new_summarized_upto).
+    """
+    start = state.get('summarized_upto', 0)
+    lines = get_chat_history(state)[start:]
+    keep = recent_turns(lines, max(1, CONTEXT_MAX_TURNS // 2), CONTEXT_TOKEN_BUDGET // 2)
+    fold = lines[:len(lines) - len(keep)]
+    return fold, start + len(fold)
+
+def build_context(state: State) -> str:
+    """
+    Prompt input for the nodes: pinned lead details, the rolling summary of older
+    turns and the most recent turns verbatim, kept under CONTEXT_TOKEN_BUDGET.
+    """
+    parts = []
+
+    user_data = {k: v for k, v in (state.get('user_data') or {}).items() if v}
+    if user_data:
+        parts.append("Known customer details: " + ", ".join(f"{k}={v}" for k, v in user_data.items()))
+
+    summary = state.get('summary')
+    if summary:
+        parts.append(f"Summary of earlier conversation: {summary}")
+
+    budget = CONTEXT_TOKEN_BUDGET - sum(count_tokens(p) for p in parts)
+    lines = get_chat_history(state)[state.get('summarized_upto', 0):]
+    parts.append("Recent conversation:\n" + "\n".join(recent_turns(lines, CONTEXT_MAX_TURNS, budget)))
+
+    return "\n\n".join(parts)
@@ -0,0 +1,168 @@
+"""
+Offline chat model for benchmarks and local runs (LLM_PROVIDER = "fake").
+
+Replies are canned and picked from the node's system prompt; latency is fixed or
+jittered, and errors can be injected to exercise the gateway's retries. Supports
+invoke/ainvoke, sync and async token streaming and structured output, and reports usage_metadata.
+
+Prefix caching is modelled on the provider's: a system prompt seen before is
+reported as cache_read tokens, and `prefill_latency` charges only uncached tokens.
+"""
+import re
+import time
+import random
+import asyncio
+import threading
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+CANNED_REPLIES = {
+    'Conversation Summarizer': "The customer asked about the Bullet 650's engine, warranty and booking, and is considering a test drive.",
+    'Sales Agent': "Welcome! The **Bullet 650** pairs the legendary thump with 650cc twin-cylinder smoothness.\nReady to book a test drive?",
+    'Test Drive Coordinator': "Let's get you on the Bullet 650! Share your **full name**, **contact number** and **preferred city** to lock in your ride.",
+    'Product Specialist': "The 650cc parallel twin delivers smooth, usable torque for effortless highway cruising, backed by the standard warranty.\nWant to feel it on a test drive?",
+}
+DEFAULT_REPLY = "The Bullet 650 is built for the road. Shall I book you a test drive?"
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def canned_intent(prompt_text: str) -> str:
+    # Mirrors the categories the real classifier is asked for, from the latest user line
+    lines = [l for l in prompt_text.splitlines() if l.startswith('human:')]
+    message = lines[-1].lower() if lines else prompt_text.lower()
+    if re.search(r"@|\d{6,}", message):
+        return 'extract'
+    if re.search(r"book|test drive|sign ?up|quote", message):
+        return 'lead'
+    if '?' in message or re.search(r"what|how|warranty|refund|price|speed", message):
+        return 'inquiry'
+    return 'greeting'
+
+
+class ProviderError(Exception):
+    # Carries an HTTP-style status like the real client errors, so retries can be exercised
+    def __init__(self, status_code: int, message: str = ''):
+        super().__init__(message or f"fake provider error {status_code}")
+        self.status_code = status_code
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model: `latency` seconds per call (+/- `jitter`), canned outputs.
+    A fraction `error_rate` of calls fails with `error_status` (429 by default).
+    `prefill_latency` adds seconds per 1000 prompt tokens not served from the prefix cache.
+    """
+
+    latency: float = 0.3
+    jitter: float = 0.0
+    seed: int = 0
+    error_rate: float = 0.0
+    error_status: int = 429
+    prefill_latency: float = 0.0
+    calls: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._seen_prefixes = set()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _delay(self, uncached_tokens: int = 0) -> float:
+        with self._lock:
+            self.calls += 1
+            failed = self._rng.random() < self.error_rate
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        if failed:
+            raise ProviderError(self.error_status)
+        return delay + self.prefill_latency * uncached_tokens / 1000
+
+    @staticmethod
+    def _uncached(reply) -> int:
+        usage = reply.usage_metadata
+        return usage['input_tokens'] - usage['input_token_details']['cache_read']
+
+    def _reply(self, messages) -> AIMessage:
+        system = messages[0].content if messages else ''
+        prompt_text = "\n".join(str(m.content) for m in messages)
+        if 'Intent Classifier' in system:
+            content = canned_intent(messages[-1].content)
+        else:
+            content = next((reply for role, reply in CANNED_REPLIES.items() if role in system), DEFAULT_REPLY)
+
+        prompt_tokens = count_tokens(prompt_text)
+        # Only a byte-identical leading system prompt can be served from the cache
+        prefix = messages[0].content if messages and messages[0].type == 'system' else None
+        with self._lock:
+            cached = count_tokens(prefix) if prefix in self._seen_prefixes else 0
+            if prefix is not None:
+                self._seen_prefixes.add(prefix)
+            self.input_tokens += prompt_tokens
+            self.cached_tokens += cached
+        return AIMessage(content=content, usage_metadata={
+            'input_tokens': prompt_tokens,
+            'output_tokens': count_tokens(content),
+            'total_tokens': prompt_tokens + count_tokens(content),
+            'input_token_details': {'cache_read': cached},
+        })
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        time.sleep(self._delay(self._uncached(reply)))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        await asyncio.sleep(self._delay(self._uncached(reply)))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Latency is spread over the tokens: a third before the first token, the rest evenly
+        reply = self._reply(messages)
+        delay = self._delay(self._uncached(reply))
+        words = re.findall(r"\S+\s*", reply.content) or [reply.content]
+        time.sleep(delay / 3)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(2 * delay / 3 / len(words))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=word, usage_metadata=reply.usage_metadata if i == len(words) - 1 else None
+            ))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        delay = self._delay(self._uncached(reply))
+        words = re.findall(r"\S+\s*", reply.content) or [reply.content]
+        await asyncio.sleep(delay / 3)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(2 * delay / 3 / len(words))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=word, usage_metadata=reply.usage_metadata if i == len(words) - 1 else None
+            ))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs):
+        # Structured calls get the schema's defaults (all fields unresolved) after the usual latency
+        def respond(prompt):
+            time.sleep(self._delay())
+            return schema()
+
+        async def arespond(prompt):
+            await asyncio.sleep(self._delay())
+            return schema()
+
+        return RunnableLambda(respond, afunc=arespond)
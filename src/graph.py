@@ -1,31 +1,69 @@
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
 from src.custom_logger import logging
+from src.checkpointer import SessionCheckpointer
+from src.answer_cache import SemanticAnswerCache
+from src.response_templates import ResponseTemplates
+from src.tracing import trace_node
 from src.state import State, route_based_on_intent
+from src.intent_classifier import FastIntentClassifier
+from src.prompts import build_prompts
 from src.nodes import (
-    classify_user_enquiry_type, 
+    summarize_conversation,
+    make_classify_user_enquiry_node, 
     reply_to_casual_greeting, 
     ask_user_for_lead_information, 
     extract_lead_data, 
-    make_reply_to_enquiry_node
+    make_reply_to_enquiry_node,
+    make_template_reply_node,
+    asummarize_conversation,
+    make_aclassify_user_enquiry_node,
+    areply_to_casual_greeting,
+    aask_user_for_lead_information,
+    aextract_lead_data,
+    make_areply_to_enquiry_node
 )
 
-def build_graph(retriever):
+# Nodes whose LLM output is the reply shown to the customer, streamed token by token
+STREAMED_NODES = ('greeting', 'inquiry', 'ask_lead_details')
+
+# Node implementations per flavour: summarize, classify factory, greeting, ask_lead, extract, inquiry factory
+SYNC_NODES = (summarize_conversation, make_classify_user_enquiry_node, reply_to_casual_greeting,
+              ask_user_for_lead_information, extract_lead_data, make_reply_to_enquiry_node)
+ASYNC_NODES = (asummarize_conversation, make_aclassify_user_enquiry_node, areply_to_casual_greeting,
+               aask_user_for_lead_information, aextract_lead_data, make_areply_to_enquiry_node)
+
+def build_graph(retriever, checkpointer=None, answer_cache=None, response_templates=None, async_nodes=False,
+                intent_classifier=None):
+    """
+    Compiles the conversation graph. With `async_nodes` every node is a coroutine
+    (LLM calls through the gateway's ainvoke, non-blocking retrieval), and the graph
+    must be run with ainvoke/astream; otherwise it is run with invoke/stream.
+    """
     
-    logging.info("Building the state graph for the RAG system.")
+    logging.info(f"Building the {'async' if async_nodes else 'sync'} state graph for the RAG system.")
     
     builder = StateGraph(State)
-    memory = MemorySaver()
+    memory = checkpointer or SessionCheckpointer()
+    intent_classifier = intent_classifier or FastIntentClassifier(retriever.embedding_manager)
+    answer_cache = answer_cache or SemanticAnswerCache()
+    response_templates = response_templates or ResponseTemplates()
+    # Static system prompts are built (and context-cached, if enabled) once per graph
+    build_prompts()
+
+    summarize, make_classify_node, greeting, ask_lead, extract, make_inquiry_node = \
+        ASYNC_NODES if async_nodes else SYNC_NODES
 
     # Nodes
-    builder.add_node('classify_user_intent', classify_user_enquiry_type)
-    builder.add_node('greeting', reply_to_casual_greeting)
-    builder.add_node('inquiry', make_reply_to_enquiry_node(retriever))
-    builder.add_node('ask_lead_details', ask_user_for_lead_information)
-    builder.add_node('extract_lead_details', extract_lead_data)
+    builder.add_node('summarize_context', trace_node('summarize_context', summarize))
+    builder.add_node('classify_user_intent', trace_node('classify_user_intent', make_classify_node(intent_classifier, retriever)))
+    builder.add_node('greeting', trace_node('greeting', make_template_reply_node('greeting', greeting, response_templates)))
+    builder.add_node('inquiry', trace_node('inquiry', make_inquiry_node(retriever, answer_cache)))
+    builder.add_node('ask_lead_details', trace_node('ask_lead_details', make_template_reply_node('ask_lead', ask_lead, response_templates)))
+    builder.add_node('extract_lead_details', trace_node('extract_lead_details', extract))
 
     # Edges
-    builder.add_edge(START, 'classify_user_intent')
+    builder.add_edge(START, 'summarize_context')
+    builder.add_edge('summarize_context', 'classify_user_intent')
     builder.add_conditional_edges(
         'classify_user_intent',
         route_based_on_intent,
@@ -0,0 +1,135 @@
+import re
+import asyncio
+import threading
+import numpy as np
+from src.custom_logger import logging
+from src.config import INTENT_FAST_PATH_THRESHOLD
+from src.lead_extractor import extract_fields, LEAD_FIELDS
+
+INTENTS = ('greeting', 'inquiry', 'lead', 'extract')
+
+# (intent, pattern, confidence) - checked in order, first match wins
+RULES = [
+    ('extract', re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), 0.99),
+    # A bare phone number; digits inside a sentence may be an order or reference number
+    ('extract', re.compile(r"^\s*(?:\+?\d[\s-]?){10,13}[\s.!]*$"), 0.97),
+    ('extract', re.compile(r"\b(my name is|my number is|my phone|my email|call me on|reach me (?:on|at)|i am from|i'm from|i live in)\b", re.I), 0.92),
+    ('lead', re.compile(r"\b(book|schedule|sign ?up|register|reserve)\b.*\b(test ?drive|ride|slot)\b", re.I), 0.95),
+    ('lead', re.compile(r"^\s*(yes|yeah|sure|ok(ay)?|let'?s do it)\b.*\b(test ?drive|book|sign ?up)\b", re.I), 0.9),
+    ('greeting', re.compile(r"^\s*(hi+|hello+|hey+|hiya|namaste|good (morning|afternoon|evening))( there)?[\s!.,]*$", re.I), 0.97),
+    ('inquiry', re.compile(r"\b(top speed|mileage|warranty|price|cost|specs?|engine|torque|power|refund|cancel\w*|deliver\w*|shipping|emi|colou?rs?)\b.*\?\s*$", re.I), 0.9),
+]
+
+# Bot turns that ask for contact details: a short reply right after one is almost always data
+LEAD_PROMPT = re.compile(r"\b(full name|contact number|phone|email|city|location)\b", re.I)
+
+# Labelled examples for the nearest-neighbour stage
+EXAMPLES = {
+    'greeting': [
+        "hi there", "hello!", "hey, how are you?", "good morning", "thanks, have a nice day",
+    ],
+    'inquiry': [
+        "what is the top speed of the bullet 650?", "how much does it cost?",
+        "what does the warranty cover?", "can i get a refund if i cancel my booking?",
+        "do you offer home delivery?", "what is the mileage?", "tell me about the engine",
+    ],
+    'lead': [
+        "i want to book a test drive", "can i schedule a ride this weekend?",
+        "sign me up for a test drive", "i'd like a quote for the bullet 650", "let's do it, book me in",
+    ],
+    'extract': [
+        "my name is rahul sharma", "my phone number is 9876543210", "i'm from bangalore",
+        "you can reach me at rahul@example.com", "arjun, mumbai",
+    ],
+}
+
+
+class FastIntentClassifier:
+    """
+    Local first stage of intent classification. Keyword/regex rules catch the
+    obvious turns; everything else is matched against labelled examples with the
+    already loaded embedding model. Callers fall back to the LLM when the returned
+    confidence is below the threshold.
+    """
+
+    def __init__(self, embedding_manager, threshold: float = INTENT_FAST_PATH_THRESHOLD):
+        self.embedding_manager = embedding_manager
+        self.threshold = threshold
+        self.example_labels = None
+        self.example_embeddings = None
+        self.stats = {'fast_path': 0, 'llm_fallback': 0}
+        self._lock = threading.Lock()
+
+    def _load_examples(self):
+        labels, texts = [], []
+        for intent, examples in EXAMPLES.items():
+            labels.extend([intent] * len(examples))
+            texts.extend(examples)
+        embeddings = np.asarray(self.embedding_manager.generate_embeddings(texts), dtype=np.float32)
+        self.example_embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self.example_labels = labels
+
+    def classify_by_rules(self, message: str, details_prompt: str = ''):
+        # details_prompt: the bot's last message when it was the lead/extract nodes asking for contact details
+        for intent, pattern, confidence in RULES:
+            # "If I book a test drive and cancel, do I get a refund?" is a question, not a booking
+            if intent == 'lead' and '?' in message:
+                continue
+            if pattern.search(message):
+                return intent, confidence
+        # A short answer to that request, if it holds a detail ("Pune", "rahul@example.com"); "ok thanks" does not
+        if details_prompt and LEAD_PROMPT.search(details_prompt) and '?' not in message \
+                and len(message.split()) <= 6 and any(field in extract_fields(message) for field in LEAD_FIELDS):
+            return 'extract', 0.85
+        return None, 0.0
+
+    def classify_by_similarity(self, message: str, query_embedding=None):
+        if self.example_embeddings is None:
+            self._load_examples()
+        if query_embedding is None:
+            query_embedding = self.embedding_manager.embed_query(message)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = self.example_embeddings @ (query / (np.linalg.norm(query) or 1.0))
+
+        best = {}
+        for label, score in zip(self.example_labels, scores):
+            best[label] = max(best.get(label, -1.0), float(score))
+        ranked = sorted(best.items(), key=lambda kv: kv[1], reverse=True)
+        (intent, top), (_, runner_up) = ranked[0], ranked[1]
+
+        # A close second-best class means the example space is ambiguous here
+        margin = top - runner_up
+        confidence = top if margin >= 0.1 else top * margin / 0.1
+        return intent, confidence
+
+    def classify(self, message: str, details_prompt: str = ''):
+        """Returns (intent, confidence); intent is None when it should go to the LLM."""
+        intent, confidence = self.classify_by_rules(message, details_prompt)
+        if confidence < self.threshold:
+            intent, confidence = self.classify_by_similarity(message)
+        return self._verdict(intent, confidence)
+
+    async def aclassify(self, message: str, details_prompt: str = ''):
+        """Async `classify`: the message is embedded without blocking the event loop."""
+        intent, confidence = self.classify_by_rules(message, details_prompt)
+        if confidence < self.threshold:
+            if self.example_embeddings is None:
+                await asyncio.to_thread(self._load_examples)
+            query_embedding = await self.embedding_manager.aembed_query(message)
+            intent, confidence = self.classify_by_similarity(message, query_embedding)
+        return self._verdict(intent, confidence)
+
+    def _verdict(self, intent, confidence):
+        hit = confidence >= self.threshold
+        with self._lock:
+            self.stats['fast_path' if hit else 'llm_fallback'] += 1
+        logging.info(f"Fast intent classifier: {intent} ({confidence:.2f}), fast-path hit rate {self.hit_rate:.0%}")
+        return (intent, confidence) if hit else (None, confidence)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.stats['fast_path'] + self.stats['llm_fallback']
+        return self.stats['fast_path'] / total if total else 0.0
+
+    def metrics(self) -> dict:
+        return {**self.stats, 'fast_path_rate': self.hit_rate, 'threshold': self.threshold}
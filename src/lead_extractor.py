@@ -0,0 +1,102 @@
+import re
+
+LEAD_FIELDS = ('name', 'contact', 'location')
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_RE = re.compile(r"(?<!\w)\+?\d[\d\s-]{8,14}\d(?!\w)")
+
+# Cities with a dealership (and common alternate spellings), lower-case -> display name
+DEALERSHIP_CITIES = {
+    'mumbai': 'Mumbai', 'bombay': 'Mumbai', 'delhi': 'Delhi', 'new delhi': 'New Delhi',
+    'bangalore': 'Bangalore', 'bengaluru': 'Bangalore', 'chennai': 'Chennai', 'madras': 'Chennai',
+    'hyderabad': 'Hyderabad', 'kolkata': 'Kolkata', 'calcutta': 'Kolkata', 'pune': 'Pune',
+    'ahmedabad': 'Ahmedabad', 'jaipur': 'Jaipur', 'lucknow': 'Lucknow', 'chandigarh': 'Chandigarh',
+    'kochi': 'Kochi', 'cochin': 'Kochi', 'thiruvananthapuram': 'Thiruvananthapuram', 'trivandrum': 'Thiruvananthapuram',
+    'kozhikode': 'Kozhikode', 'calicut': 'Kozhikode', 'coimbatore': 'Coimbatore', 'mysore': 'Mysore',
+    'mysuru': 'Mysore', 'mangalore': 'Mangalore', 'goa': 'Goa', 'panaji': 'Goa', 'indore': 'Indore',
+    'bhopal': 'Bhopal', 'nagpur': 'Nagpur', 'surat': 'Surat', 'vadodara': 'Vadodara', 'noida': 'Noida',
+    'gurgaon': 'Gurugram', 'gurugram': 'Gurugram', 'visakhapatnam': 'Visakhapatnam', 'vizag': 'Visakhapatnam',
+    'bhubaneswar': 'Bhubaneswar', 'guwahati': 'Guwahati', 'patna': 'Patna', 'dehradun': 'Dehradun',
+}
+CITY_RE = re.compile(r"\b(" + "|".join(sorted(map(re.escape, DEALERSHIP_CITIES), key=len, reverse=True)) + r")\b", re.I)
+
+NAME_RE = re.compile(r"\b(my name is|name's|i am|i'm|im|this is|call me)\s+([A-Za-z][A-Za-z'.-]*(?:\s+[A-Za-z][A-Za-z'.-]*){0,2})", re.I)
+# Only these cues may replace a name already captured ("I'm Rahul", then "my name is Rohit, sorry")
+EXPLICIT_NAME_CUES = {'my name is', "name's", 'call me'}
+# Words that end a name ("I'm Arjun from Pune") or show the phrase was not a name ("I'm interested", "this is great")
+NAME_STOPWORDS = {
+    'from', 'and', 'in', 'at', 'here', 'my', 'i', 'living', 'based', 'staying', 'near', 'with', 'calling',
+    'interested', 'looking', 'planning', 'not', 'just', 'also', 'ready', 'good', 'fine', 'okay', 'ok',
+    'available', 'free', 'sure', 'happy', 'a', 'an', 'the', 'going', 'keen', 'thinking',
+    'great', 'nice', 'cool', 'awesome', 'perfect', 'amazing', 'excellent', 'wonderful', 'fantastic',
+    'interesting', 'helpful', 'useful', 'right', 'correct', 'done', 'so', 'very', 'really', 'too',
+    'what', 'how', 'why', 'when', 'where', 'that', 'about', 'all', 'back', 'again',
+}
+# Filler left over once the recognised fields are removed from a message
+FILLER_WORDS = NAME_STOPWORDS | {
+    'hi', 'hello', 'hey', 'yes', 'yeah', 'name', 'is', 'number', 'phone', 'contact', 'email', 'mobile', 'city',
+    'location', 'me', 'you', 'can', 'reach', 'on', 'it', 'its', "it's", 'this', 'thanks', 'thank', 'please',
+    'call', 'live', 'am', "i'm", 'im', 'mail', 'whatsapp', 'dealership', 'prefer', 'preferred', 'id', 'to', 'of',
+    'test', 'drive', 'ride', 'book', 'booking', 'for',
+}
+# Filler never belongs in a name either ("call me on 98...", "I'm reachable at ...")
+NAME_STOPWORDS |= FILLER_WORDS
+
+
+def extract_fields(message: str, last_bot_message: str = '') -> dict:
+    """
+    Rule-based extraction of lead fields from a single user message.
+    Returns only the fields it found, plus '_leftover': whether the message still
+    has words the rules could not explain (worth asking the LLM about), and with a
+    name, '_name_stated': whether it came from an explicit "my name is / call me".
+    """
+    found, text = {}, message
+
+    email = EMAIL_RE.search(text)
+    if email:
+        found['contact'] = email.group(0)
+        text = text.replace(email.group(0), ' ')
+    phone = PHONE_RE.search(text)
+    if phone and len(re.sub(r"\D", "", phone.group(0))) >= 10:
+        found.setdefault('contact', re.sub(r"[\s-]", "", phone.group(0)))
+        text = text.replace(phone.group(0), ' ')
+
+    city = CITY_RE.search(text)
+    if city:
+        found['location'] = DEALERSHIP_CITIES[city.group(1).lower()]
+        text = text[:city.start()] + ' ' + text[city.end():]
+
+    for name in NAME_RE.finditer(text):
+        tokens = []
+        for token in name.group(2).split():
+            if token.lower() in NAME_STOPWORDS:
+                break
+            tokens.append(token)
+        if tokens:
+            found['name'] = " ".join(t.capitalize() for t in tokens)
+            found['_name_stated'] = name.group(1).lower() in EXPLICIT_NAME_CUES
+            text = text.replace(" ".join(tokens), ' ')
+            break
+
+    leftover = [w for w in re.findall(r"[A-Za-z']+", text) if w.lower() not in FILLER_WORDS]
+    # A bare "Arjun Sharma" right after the bot asked for a name
+    if 'name' not in found and leftover and len(leftover) <= 3 and 'name' in last_bot_message.lower() \
+            and '?' not in message:
+        found['name'] = " ".join(w.capitalize() for w in leftover)
+        leftover = []
+
+    found['_leftover'] = bool(leftover)
+    return found
+
+def merge_lead_data(existing, new) -> dict:
+    # New values fill or update fields, but a missing value never erases a captured one,
+    # and a captured name is only replaced by an explicitly stated one
+    new = new or {}
+    merged = {field: (existing or {}).get(field) for field in LEAD_FIELDS}
+    for field in LEAD_FIELDS:
+        if not new.get(field):
+            continue
+        if field == 'name' and merged['name'] and not new.get('_name_stated'):
+            continue
+        merged[field] = new[field]
+    return merged
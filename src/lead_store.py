@@ -0,0 +1,111 @@
+"""
+SQLite lead store. Every capture is a single upsert keyed by the normalized
+contact, so repeat leads merge into one row and capture cost does not grow with
+the number of stored leads. Excel is only produced on demand:
+
+    python -m src.lead_store export [captured_leads.xlsx]
+    python -m src.lead_store import captured_leads.xlsx
+"""
+import re
+import sys
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from src.custom_logger import logging
+from src.config import LEADS_DB_PATH, LEADS_FILE
+from src.shared_state import FileLock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    contact TEXT,
+    contact_key TEXT,
+    location TEXT,
+    captures INTEGER NOT NULL DEFAULT 1,
+    timestamp TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS leads_contact_key ON leads (contact_key);
+"""
+
+EXPORT_COLUMNS = ['name', 'contact', 'location', 'timestamp', 'updated_at', 'captures']
+
+
+def normalize_contact(contact):
+    """Emails compare case-insensitively, phone numbers by their last 10 digits."""
+    if not contact:
+        return None
+    contact = str(contact).strip()
+    if '@' in contact:
+        return contact.lower()
+    digits = re.sub(r"\D", "", contact)
+    return digits[-10:] if len(digits) >= 10 else digits or contact.lower()
+
+
+class LeadStore:
+    def __init__(self, path: str = LEADS_DB_PATH):
+        self.path = path
+        # One writer at a time across threads and worker processes
+        self.write_lock = FileLock(path + '.lock')
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Short-lived connections: safe across threads, and concurrent writers
+        # (threads or worker processes) queue on SQLite's lock instead of failing
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(self, lead_data: dict):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.write_lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                INSERT INTO leads (name, contact, contact_key, location, timestamp, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (contact_key) DO UPDATE SET
+                    name = COALESCE(excluded.name, leads.name),
+                    contact = COALESCE(excluded.contact, leads.contact),
+                    location = COALESCE(excluded.location, leads.location),
+                    captures = leads.captures + 1,
+                    updated_at = excluded.updated_at
+                """,
+                (lead_data.get('name'), lead_data.get('contact'), normalize_contact(lead_data.get('contact')),
+                 lead_data.get('location'), lead_data.get('timestamp') or now, now)
+            )
+
+    def all_leads(self) -> list:
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM leads ORDER BY id")]
+
+    def export_to_excel(self, path: str = LEADS_FILE) -> int:
+        import pandas as pd
+
+        leads = self.all_leads()
+        pd.DataFrame(leads, columns=EXPORT_COLUMNS).to_excel(path, index=False, engine='openpyxl')
+        logging.info(f"Exported {len(leads)} leads to {path}")
+        return len(leads)
+
+    def import_from_excel(self, path: str = LEADS_FILE) -> int:
+        # One-off migration of leads captured by the old Excel write path
+        import pandas as pd
+
+        rows = pd.read_excel(path).astype(object).where(lambda df: df.notna(), None).to_dict('records')
+        for row in rows:
+            self.save({key: (str(value) if value is not None else None) for key, value in row.items()})
+        return len(rows)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'export'
+    path = sys.argv[2] if len(sys.argv) > 2 else LEADS_FILE
+    store = LeadStore()
+
+    if command == 'export':
+        print(f"Exported {store.export_to_excel(path)} leads to {path}")
+    elif command == 'import':
+        print(f"Imported {store.import_from_excel(path)} leads from {path}")
+    else:
+        sys.exit(f"Unknown command '{command}', expected 'export' or 'import'.")
@@ -0,0 +1,115 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+from src.custom_logger import logging
+from src.config import BM25_INDEX_PATH
+
+# Exact spec tokens ("650cc", "47.04", "abs") survive as single terms
+TOKEN_RE = re.compile(r"\d+(?:\.\d+)?[a-z]*|[a-z]+")
+STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'be', 'of', 'to', 'in', 'on', 'for', 'and', 'or', 'it', 'its', 'does',
+    'do', 'what', 'how', 'which', 'with', 'by', 'at', 'as', 'this', 'that', 'i', 'me', 'my', 'you', 'your', 'can',
+    'there', 'any', 'about', 'if', 'from', 'will', 'have', 'has', 'much', 'many', 'tell', 'please',
+}
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        # "650cc" also matches a bare "650"
+        number = re.match(r"\d+(?:\.\d+)?", token)
+        if number and number.group(0) != token:
+            tokens.append(number.group(0))
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the indexed chunks, kept in step with the vector store by the
+    indexer and persisted as term counts per chunk in a JSON file next to the
+    vector DB. Postings and document frequencies are rebuilt in memory on load.
+    """
+
+    def __init__(self, path: str = BM25_INDEX_PATH, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1, self.b = k1, b
+        self.term_counts = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def __len__(self):
+        return len(self.term_counts)
+
+    def _rebuild(self):
+        self.postings = {}
+        for chunk_id, counts in self.term_counts.items():
+            for term, count in counts.items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+        self.lengths = {chunk_id: sum(counts.values()) for chunk_id, counts in self.term_counts.items()}
+        self.avg_length = sum(self.lengths.values()) / len(self.lengths) if self.lengths else 0.0
+
+    def add(self, ids, documents):
+        with self._lock:
+            for chunk_id, document in zip(ids, documents):
+                self.term_counts[chunk_id] = dict(Counter(tokenize(document)))
+            self._rebuild()
+
+    def delete(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                self.term_counts.pop(chunk_id, None)
+            self._rebuild()
+
+    def clear(self):
+        with self._lock:
+            self.term_counts = {}
+            self._rebuild()
+
+    def _idf(self, term: str) -> float:
+        n, df = len(self.term_counts), len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def query_weight(self, query: str) -> float:
+        """
+        Score of a chunk of average length holding each query term once: what a full
+        match is worth, to compare `search` scores against. Terms no chunk contains
+        are left out, since no chunk can match them.
+        """
+        return sum(self._idf(term) for term in set(tokenize(query)) if term in self.postings)
+
+    def search(self, query: str, top_k: int = 20) -> list:
+        """[(chunk_id, score)] best first; chunks sharing no term with the query are left out."""
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for chunk_id, count in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / self.avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'k1': self.k1, 'b': self.b, 'term_counts': self.term_counts}, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.term_counts = json.load(f)['term_counts']
+            except (OSError, ValueError, KeyError) as e:
+                logging.info(f"Ignoring unreadable BM25 index {self.path}: {e}")
+                self.term_counts = {}
+        self._rebuild()
+        logging.info(f"Loaded BM25 index with {len(self.term_counts)} chunks.")
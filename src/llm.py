@@ -0,0 +1,299 @@
+"""
+Every LLM call the nodes make goes through `LLMGateway`, which provides:
+
+- a cap on in-flight requests (a thread semaphore for sync callers, an asyncio one
+  for async callers, each LLM_MAX_CONCURRENCY wide)
+- token-bucket rate limiting shared by both paths
+- a per-call timeout (a sync call that outlives it keeps its slot until it returns)
+- retries with jittered exponential backoff on 429/5xx and timeouts
+- single-flight coalescing: identical prompts already in flight share one call
+- queue-delay, retry and coalescing metrics
+"""
+import os
+import time
+import random
+import asyncio
+import hashlib
+import weakref
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from src.config import (
+    GEMINI_MODEL, LLM_PROVIDER, LLM_MAX_CONCURRENCY, LLM_RATE_PER_SECOND, LLM_BURST, LLM_TIMEOUT,
+    LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, FAKE_LLM_LATENCY
+)
+from src.custom_logger import logging
+from src.tracing import span, annotate, add_usage
+
+# Chat model shared by every node, created on first use rather than at import
+llm = None
+llm_lock = threading.Lock()
+
+
+def get_llm():
+    global llm
+    if llm is None:
+        with llm_lock:
+            if llm is None:
+                if LLM_PROVIDER == 'fake':
+                    from src.fake_llm import FakeChatModel
+                    logging.info("Using the offline fake chat model.")
+                    llm = FakeChatModel(latency=FAKE_LLM_LATENCY)
+                    return llm
+                if not os.getenv("GOOGLE_API_KEY"):
+                    raise ValueError("GOOGLE_API_KEY not found in environment variables")
+                from langchain.chat_models import init_chat_model
+                logging.info(f"Initializing chat model {GEMINI_MODEL}.")
+                # Retries and timeouts are the gateway's job, not the client's
+                llm = init_chat_model(GEMINI_MODEL, max_retries=0, timeout=LLM_TIMEOUT)
+    return llm
+
+def set_llm(model):
+    # Swap in another chat model (e.g. the benchmark stub) for every node
+    global llm
+    with llm_lock:
+        llm = model
+
+
+class TokenBucket:
+    """`rate` requests per second on average, bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # Takes a token and returns how long the caller must wait before using it
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+def status_code(error):
+    # HTTP status from the client's exception, wherever that client keeps it
+    for candidate in (error, getattr(error, 'response', None)):
+        for attribute in ('status_code', 'code', 'status'):
+            value = getattr(candidate, attribute, None)
+            if isinstance(value, int):
+                return value
+    text = str(error)
+    if '429' in text or 'RESOURCE_EXHAUSTED' in text:
+        return 429
+    return None
+
+def is_retryable(error) -> bool:
+    if isinstance(error, (TimeoutError, FutureTimeout, asyncio.TimeoutError)):
+        return True
+    code = status_code(error)
+    return code is not None and (code == 429 or code >= 500)
+
+def prompt_key(prompt, output_schema, cached_content=None) -> str:
+    parts = [getattr(output_schema, '__name__', ''), cached_content or '']
+    for message in prompt:
+        parts.append(f"{getattr(message, 'type', '')}\0{getattr(message, 'content', message)}")
+    return hashlib.sha256("\x1e".join(map(str, parts)).encode('utf-8')).hexdigest()
+
+
+class LLMGateway:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, rate_per_second=LLM_RATE_PER_SECOND,
+                 burst: int = LLM_BURST, timeout: float = LLM_TIMEOUT, max_retries: int = LLM_MAX_RETRIES,
+                 backoff_base: float = LLM_BACKOFF_BASE, backoff_max: float = LLM_BACKOFF_MAX):
+        self.max_concurrency = max_concurrency
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.async_slots = weakref.WeakKeyDictionary()
+        self.bucket = TokenBucket(rate_per_second, burst) if rate_per_second else None
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base, self.backoff_max = backoff_base, backoff_max
+
+        # Calls run on these threads so a hung request can be abandoned at the timeout
+        self.pool = ThreadPoolExecutor(max_workers=2 * max_concurrency, thread_name_prefix='llm-call')
+        self.in_flight = {}
+        self.abandoned = 0
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'coalesced': 0, 'retries': 0, 'timeouts': 0, 'failures': 0}
+        self.queue_delays = deque(maxlen=1000)
+
+    def _model(self, output_schema, cached_content=None):
+        model = get_llm()
+        if cached_content:
+            # The system prompt lives in the provider's context cache; only the suffix is sent
+            model = model.bind(cached_content=cached_content)
+        return model.with_structured_output(output_schema) if output_schema else model
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _record_queue_delay(self, seconds: float):
+        self.queue_delays.append(seconds * 1000)
+        annotate(queue_ms=round(seconds * 1000, 2))
+
+    def _join(self, key):
+        # Returns (future, leader): the leader makes the call, everyone else waits on its future
+        with self._lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future, False
+            future = self.in_flight[key] = Future()
+            return future, True
+
+    def _finish(self, key, future, response=None, error=None):
+        with self._lock:
+            self.in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(response)
+
+    def _release_abandoned(self, call):
+        with self._lock:
+            self.abandoned -= 1
+        self.slots.release()
+
+    def _attempt(self, model, prompt):
+        queued = time.perf_counter()
+        self.slots.acquire()
+        release = True
+        try:
+            if self.bucket:
+                time.sleep(self.bucket.reserve())
+            self._record_queue_delay(time.perf_counter() - queued)
+            # Copy the context so streaming callbacks and trace spans follow the call
+            call = self.pool.submit(contextvars.copy_context().run, model.invoke, prompt)
+            try:
+                return call.result(timeout=self.timeout)
+            except FutureTimeout:
+                self.stats['timeouts'] += 1
+                if not call.cancel():
+                    # A running call cannot be stopped (the client's own timeout ends it): it keeps
+                    # its slot until it returns, so hung calls never pile up on the pool unaccounted
+                    release = False
+                    with self._lock:
+                        self.abandoned += 1
+                    call.add_done_callback(self._release_abandoned)
+                raise TimeoutError(f"LLM call timed out after {self.timeout}s")
+        finally:
+            if release:
+                self.slots.release()
+
+    async def _aattempt(self, model, prompt):
+        loop = asyncio.get_running_loop()
+        slots = self.async_slots.get(loop)
+        if slots is None:
+            slots = self.async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        queued = time.perf_counter()
+        async with slots:
+            if self.bucket:
+                await asyncio.sleep(self.bucket.reserve())
+            self._record_queue_delay(time.perf_counter() - queued)
+            try:
+                return await asyncio.wait_for(model.ainvoke(prompt), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.stats['timeouts'] += 1
+                raise TimeoutError(f"LLM call timed out after {self.timeout}s")
+
+    def _should_retry(self, error, attempt: int) -> bool:
+        if attempt >= self.max_retries or not is_retryable(error):
+            self.stats['failures'] += 1
+            return False
+        self.stats['retries'] += 1
+        logging.info(f"LLM call failed ({error!r}), retry {attempt + 1}/{self.max_retries}.")
+        return True
+
+    def _call(self, prompt, output_schema, cached_content=None):
+        model = self._model(output_schema, cached_content)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._attempt(model, prompt), attempt + 1
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                time.sleep(self._backoff(attempt))
+
+    async def _acall(self, prompt, output_schema, cached_content=None):
+        model = self._model(output_schema, cached_content)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._aattempt(model, prompt), attempt + 1
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+
+    def invoke(self, prompt, output_schema=None, cached_content=None):
+        """
+        Sync call; output_schema: pydantic model for structured output instead of a chat message,
+        cached_content: name of a provider context cache holding the system prompt.
+        """
+        key = prompt_key(prompt, output_schema, cached_content)
+        with span('llm.invoke'):
+            future, leader = self._join(key)
+            if not leader:
+                annotate(coalesced=True)
+                return copy_response(future.result())
+
+            self.stats['calls'] += 1
+            try:
+                response, attempts = self._call(prompt, output_schema, cached_content)
+            except BaseException as e:
+                self._finish(key, future, error=e)
+                raise
+            self._finish(key, future, response)
+            annotate(attempts=attempts)
+            add_usage(response)
+            return response
+
+    async def ainvoke(self, prompt, output_schema=None, cached_content=None):
+        key = prompt_key(prompt, output_schema, cached_content)
+        with span('llm.invoke'):
+            future, leader = self._join(key)
+            if not leader:
+                annotate(coalesced=True)
+                return copy_response(await asyncio.wrap_future(future))
+
+            self.stats['calls'] += 1
+            try:
+                response, attempts = await self._acall(prompt, output_schema, cached_content)
+            except BaseException as e:
+                self._finish(key, future, error=e)
+                raise
+            self._finish(key, future, response)
+            annotate(attempts=attempts)
+            add_usage(response)
+            return response
+
+    def metrics(self) -> dict:
+        delays = sorted(self.queue_delays)
+        return {
+            **self.stats,
+            'abandoned': self.abandoned,
+            'queue_ms_p50': delays[len(delays) // 2] if delays else 0.0,
+            'queue_ms_p95': delays[int(len(delays) * 0.95)] if delays else 0.0,
+            'queue_ms_max': delays[-1] if delays else 0.0,
+        }
+
+
+def copy_response(response):
+    # Coalesced callers each get their own message object, since the graph assigns message ids
+    return response.model_copy() if hasattr(response, 'model_copy') else response
+
+
+gateway = None
+
+
+def get_gateway() -> LLMGateway:
+    global gateway
+    if gateway is None:
+        with llm_lock:
+            if gateway is None:
+                gateway = LLMGateway()
+    return gateway
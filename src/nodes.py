@@ -1,13 +1,79 @@
-import json
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from src.config import GEMINI_MODEL
+import asyncio
+import inspect
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import HumanMessage, AIMessage
+from src.config import PREFETCH_RETRIEVAL, PREFETCH_WORKERS
 from src.custom_logger import logging
-from src.state import get_chat_history,State
+from src.state import get_chat_history,State,LeadValidationModel,route_based_on_intent,intent_label
+from src.lead_extractor import extract_fields, merge_lead_data
+from src.context import build_context, needs_summary, turns_to_fold
+from src.retriever import format_chunks, clean_query
+from src.tracing import annotate
+from src.llm import get_gateway
+from src.prompts import get_prompts
 
 
-llm = init_chat_model(GEMINI_MODEL)
+def invoke_llm(prompt_name, *suffix, output_schema=None):
+    # Static system prompt (or its context cache) plus this call's messages, sent through
+    # the gateway (limits, retries, coalescing)
+    prompt, cached_content = get_prompts().messages(prompt_name, *suffix)
+    return get_gateway().invoke(prompt, output_schema, cached_content)
 
+async def ainvoke_llm(prompt_name, *suffix, output_schema=None):
+    prompt, cached_content = get_prompts().messages(prompt_name, *suffix)
+    return await get_gateway().ainvoke(prompt, output_schema, cached_content)
+
+
+# Runs retrieval for the latest message while the intent classifier is still deciding
+prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+
+
+def retrieve_for_query(rag_retriever, query: str, previous=None) -> dict:
+    # Embedding is kept alongside the chunks so the inquiry node can reuse it
+    query_embedding = rag_retriever.embedding_manager.embed_query(clean_query(query))
+    # A follow-up the thread's last chunks already answer skips the search
+    if rag_retriever.covers(previous, query, query_embedding):
+        return {'query': query, 'embedding': query_embedding.tolist(), 'chunks': previous['chunks'], 'reused': True}
+    chunks = rag_retriever.retrieve_chunks(query, query_embedding=query_embedding)
+    return {'query': query, 'embedding': query_embedding.tolist(), 'chunks': chunks}
+
+async def aretrieve_for_query(rag_retriever, query: str, previous=None) -> dict:
+    query_embedding = await rag_retriever.embedding_manager.aembed_query(clean_query(query))
+    if rag_retriever.covers(previous, query, query_embedding):
+        return {'query': query, 'embedding': query_embedding.tolist(), 'chunks': previous['chunks'], 'reused': True}
+    chunks = await rag_retriever.aretrieve_chunks(query, query_embedding=query_embedding)
+    return {'query': query, 'embedding': query_embedding.tolist(), 'chunks': chunks}
+
+
+def summary_request(state:State):
+    
+    # Fold turns that dropped out of the context window into the rolling summary.
+    # Only the newly dropped turns are sent, so the summary is built incrementally.
+    if not needs_summary(state):
+        return None
+    
+    fold, summarized_upto = turns_to_fold(state)
+    logging.info(f"Folding {len(fold)} older messages into the conversation summary.")
+    
+    suffix = HumanMessage(f"Current summary: {state.get('summary') or 'None'}\n\nNew messages:\n" + "\n".join(fold))
+    return suffix, summarized_upto
+
+def summarize_conversation(state:State) -> State:
+    request = summary_request(state)
+    if request is None:
+        return {}
+    suffix, summarized_upto = request
+    summary = invoke_llm('summarize', suffix).content.strip()
+    return {'summary': summary, 'summarized_upto': summarized_upto}
+
+async def asummarize_conversation(state:State) -> State:
+    request = summary_request(state)
+    if request is None:
+        return {}
+    suffix, summarized_upto = request
+    summary = (await ainvoke_llm('summarize', suffix)).content.strip()
+    return {'summary': summary, 'summarized_upto': summarized_upto}
 
 def classify_user_enquiry_type(state:State) -> State:
     
@@ -15,147 +81,193 @@ def classify_user_enquiry_type(state:State) -> State:
     # user_chat = state['messages']
     
     logging.info("Classifying user enquiry type based on chat history.")
-    chat_history = str(get_chat_history(state))
+    chat_history = build_context(state)
     
-    prompt = [ SystemMessage("""
-                    ### ROLE
-                    Expert Intent Classifier for a Bike Dealership.
+    intent = invoke_llm('classify', HumanMessage(chat_history))
+
+    # Stored as the routed label, so later checks (e.g. lead saving) can compare it directly
+    return {'user_intent': intent_label(intent.content)}
+
+async def aclassify_user_enquiry_type(state:State) -> State:
+    logging.info("Classifying user enquiry type based on chat history.")
+    intent = await ainvoke_llm('classify', HumanMessage(build_context(state)))
+    return {'user_intent': intent_label(intent.content)}
 
-                    ### CATEGORIES
-                    - **greeting**: Social openers or pleasantries.
-                    - **inquiry**: Questions about bike specs, warranty, or policies requiring document lookup.
-                    - **lead**: High-intent actions such as booking a test drive or requesting a quote.
-                    - **extract**: Providing contact info, location, or preferred bike model details.
+def details_prompt(state: State) -> str:
+    # The bot's last message if the lead/extract nodes sent it to ask for contact details (the
+    # checkpointed intent is still last turn's), '' otherwise
+    messages, user_data = state['messages'], state.get('user_data') or {}
+    if len(messages) < 2 or intent_label(state.get('user_intent') or '') not in ('lead', 'extract'):
+        return ''
+    if user_data and all(user_data.values()):
+        return ''
+    return messages[-2].content
 
-                    ### CRITICAL OUTPUT RULE
-                    - Output ONLY the category name.
-                    - STRICTLY NO JSON, NO preamble, and NO conversational filler.
+def wants_prefetch(intent_classifier, message: str, last_details_prompt: str) -> bool:
+    # Retrieval starts right away unless a rule already says this is not an inquiry;
+    # it only needs the message, not the classifier's verdict
+    rule_intent, rule_confidence = intent_classifier.classify_by_rules(message, last_details_prompt)
+    return rule_intent == 'inquiry' or rule_confidence < intent_classifier.threshold
 
-                    ### EXAMPLES
-                    User: "Hi there!" -> greeting
-                    User: "I want to book a test drive for the X-500 tomorrow." -> lead
-                    User: "What is the top speed of the cruiser model?" -> inquiry
-                    User: "My phone number is 555-0199." -> extract
-                """),
-              
-              HumanMessage(chat_history)
-            ]
+def make_classify_user_enquiry_node(intent_classifier, rag_retriever=None):
+    logging.info("Creating intent classification node with local fast path.")
     
-    intent = llm.invoke(prompt)
+    def classify_with_fast_path(state:State) -> State:
+        messages = state['messages']
+        last_details_prompt = details_prompt(state)
+        
+        prefetch = None
+        if PREFETCH_RETRIEVAL and rag_retriever is not None \
+                and wants_prefetch(intent_classifier, messages[-1].content, last_details_prompt):
+            # Copy the context so the prefetch spans land in this turn's trace
+            prefetch = prefetch_pool.submit(
+                contextvars.copy_context().run, retrieve_for_query, rag_retriever, get_chat_history(state)[-1],
+                state.get('last_retrieval')
+            )
+        
+        # Try the local classifier on the latest user message before paying for an LLM call
+        intent, confidence = intent_classifier.classify(messages[-1].content, last_details_prompt)
+        annotate(intent_fast_path=intent is not None, intent_confidence=round(confidence, 3))
+        
+        if intent is None:
+            logging.info(f"Fast path not confident ({confidence:.2f}), falling back to LLM classifier.")
+            update = classify_user_enquiry_type(state)
+        else:
+            update = {'user_intent': intent}
+        
+        # Hand the prefetched chunks to the inquiry node, or drop them for any other route
+        update['retrieval'] = None
+        if prefetch is not None:
+            if route_based_on_intent(update) == 'inquiry':
+                update['retrieval'] = prefetch.result()
+            else:
+                prefetch.cancel()
+        return update
+    
+    return classify_with_fast_path
+
+def make_aclassify_user_enquiry_node(intent_classifier, rag_retriever=None):
+    logging.info("Creating async intent classification node with local fast path.")
+
+    async def aclassify_with_fast_path(state:State) -> State:
+        messages = state['messages']
+        last_details_prompt = details_prompt(state)
+
+        prefetch = None
+        if PREFETCH_RETRIEVAL and rag_retriever is not None \
+                and wants_prefetch(intent_classifier, messages[-1].content, last_details_prompt):
+            # A task on the same loop, so it needs no thread; it inherits the turn's trace context
+            prefetch = asyncio.ensure_future(
+                aretrieve_for_query(rag_retriever, get_chat_history(state)[-1], state.get('last_retrieval'))
+            )
 
-    return {'user_intent': intent}
+        try:
+            intent, confidence = await intent_classifier.aclassify(messages[-1].content, last_details_prompt)
+            annotate(intent_fast_path=intent is not None, intent_confidence=round(confidence, 3))
+            if intent is None:
+                logging.info(f"Fast path not confident ({confidence:.2f}), falling back to LLM classifier.")
+                update = await aclassify_user_enquiry_type(state)
+            else:
+                update = {'user_intent': intent}
+        except BaseException:
+            # Includes cancellation of the turn: don't leave the prefetch running on its own
+            if prefetch is not None:
+                prefetch.cancel()
+            raise
+
+        update['retrieval'] = None
+        if prefetch is not None:
+            if route_based_on_intent(update) == 'inquiry':
+                update['retrieval'] = await prefetch
+            else:
+                prefetch.cancel()
+        return update
+
+    return aclassify_with_fast_path
 
 def reply_to_casual_greeting(state:State) -> State:
     
     # user_chat = state['messages'][-1].content
     
     logging.info("Generating reply to casual greeting.")
-    chat_history = str(get_chat_history(state))
+    chat_history = build_context(state)
     
     
-    prompt = [
-        SystemMessage("""
-                    **Role:** You are an expert Sales Agent for the all-new Royal Enfield Bullet 650. Your primary objective is to get the user to sign-up for a test drive.
-
-                    **Persona:** Professional, passionate about motorcycling heritage, and helpful. Your tone should be "Modern Classic"—reverent of the Bullet’s 90-year legacy but excited about the new 650cc twin engine.
-
-                    **Guidelines:**
-                    1. **The Greeting:** When the user says "Hello" or greets you, respond warmly and immediately deliver a high-impact sales pitch for the Bullet 650. Focus on the legendary "thump" now paired with 650cc parallel-twin smoothness. End with a call to action to sign up for a test drive.
-                    2. **The Value Hook:** provide brief, punchy "value bombs" to entice the user:
-                        - Mention the seamless torque of the 650 Twin engine.
-                        - Highlight the iconic hand-painted pinstripes and metal build.
-                        - Emphasize that it’s the perfect blend of soul and modern reliability.
-                    3. **ONLY IF USER WANT TO SIGNUP FOR A TEST DRIVE** As soon as the user agrees sign up for a test drive, you MUST collect:
-                        - Full Name
-                        - Contact Number
-                        - Preferred Location/City
-                    4. **Constraint:** Keep responses brief and scannable. No "walls of text." Use bolding for emphasis. Avoid fluff. MAX 3 sentences per response.
-
-                    """),
-        HumanMessage(chat_history)
-    ]    
-    state = {'messages':[llm.invoke(prompt)]}
+    state = {'messages':[invoke_llm('greeting', HumanMessage(chat_history))]}
     
     return state
 
-import json
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-
-from langchain_core.messages import SystemMessage, HumanMessage
+async def areply_to_casual_greeting(state:State) -> State:
+    logging.info("Generating reply to casual greeting.")
+    return {'messages': [await ainvoke_llm('greeting', HumanMessage(build_context(state)))]}
 
 def ask_user_for_lead_information(state: State):
     
-    chat_history = str(get_chat_history(state))
+    chat_history = build_context(state)
     logging.info("Asking user for lead information to complete test drive booking.")
     
-    prompt = [
-        SystemMessage(f"""
-            **Role:** Royal Enfield Test Drive Coordinator
-            **Goal:** Secure a booking for the all-new Bullet 650.
-
-            **Instructions:**
-            1. **The Hook:** Greet the user with a "Modern Classic" vibe. Mention the legendary 650cc twin-engine "thump."
-            2. **Data Collection:** To book the ride, you must collect:
-                - Full Name
-                - Contact Number
-                - Preferred Dealership Location
-            3. **Smart Logic:** - If the user hasn't shared anything, ask for all three details excitedly.
-                - If they have shared some info (e.g., "I'm in Delhi"), ask only for Name and Number.
-            4. **Tone:** Rugged, premium, and brief.
-            
-            **Additional Instructions:**
-                - Check the chat history below.
-                - Keep it brief and conversational.
-        """),
-        HumanMessage(chat_history)
-    ]
-    
-    response = llm.invoke(prompt)
+    response = invoke_llm('ask_lead', HumanMessage(chat_history))
     
     return {'messages': [response]}
 
+async def aask_user_for_lead_information(state: State):
+    logging.info("Asking user for lead information to complete test drive booking.")
+    return {'messages': [await ainvoke_llm('ask_lead', HumanMessage(build_context(state)))]}
 
-def extract_lead_data(state: State) -> dict:
-    
-    logging.info("Extracting lead data from user messages for test drive booking.")
-    chat_history = str(get_chat_history(state))
-    
-    prompt = [
-        SystemMessage("""
-            **Role:** Lead Extraction Engine (Bullet 650)
-            **Goal:** Parse chat history to extract sales lead data into a structured JSON format.
 
-            **Extraction Rules:**
-                - **name**: User's full name (String or null)
-                - **contact**: Email address or Phone number (String or null)
-                - **location**: City, area, or preferred dealership (String or null)
+def make_template_reply_node(node, llm_reply, response_templates=None):
+    # Serves a pre-generated reply for the turn when one fits, otherwise runs the LLM node
+    logging.info(f"Creating {node} node with the response-template tier.")
+
+    def template_reply(state: State):
+        reply = response_templates.select(node, state) if response_templates is not None else None
+        annotate(response_template=reply is not None)
+        return None if reply is None else {'messages': [AIMessage(content=reply)]}
+
+    # Wraps sync and async LLM nodes alike
+    if inspect.iscoroutinefunction(llm_reply):
+        async def areply_from_template(state: State) -> State:
+            return template_reply(state) or await llm_reply(state)
+        return areply_from_template
+
+    def reply_from_template(state: State) -> State:
+        return template_reply(state) or llm_reply(state)
 
-            **Output Format:** ONLY JSON. No prose, no conversational filler.
+    return reply_from_template
 
-            **Example Output:** {"name": "Rahul Sharma", "contact": "9876543210", "location": "Mumbai"}
-            
-            **Critical Instruction:** If any field is missing, set its value to null.
-            Example: {"name": "John", "contact": null, "location": "Mumbai"}
-        """),
-        HumanMessage(content=chat_history)
-    ] 
+
+def extract_lead_data_by_rules(state: State):
     
-    # 3. Invoke LLM & Parse
-    response = llm.invoke(prompt).content
-    cleaned_json = response.replace('```json', '').replace('```', '').strip()
+    # Rules first: parse only the newest message and merge it into what we already have.
+    # On the first extract turn, earlier user messages may hold details too (e.g. "I'm Arjun from Pune").
+    messages = state['messages']
+    lead_data = state.get('user_data')
+    if not lead_data:
+        for message in messages[:-1]:
+            if isinstance(message, HumanMessage):
+                lead_data = merge_lead_data(lead_data, extract_fields(message.content))
+    last_bot_message = messages[-2].content if len(messages) > 1 else ''
+    found = extract_fields(messages[-1].content, last_bot_message)
+    lead_data = merge_lead_data(lead_data, found)
     
-    try:
-        lead_data = json.loads(cleaned_json)
-    except json.JSONDecodeError:
-        lead_data = {"name": None, "contact": None, "location": None}
+    # The LLM is asked only for fields still missing, and only if the message has words the rules could not place
+    missing_fields = [key for key, value in lead_data.items() if not value]
+    return lead_data, missing_fields if found['_leftover'] else []
+
+def lead_extraction_request(state: State, missing_fields: list):
+    logging.info(f"Rule-based extraction left {missing_fields} unresolved, asking the LLM.")
+    # The fields to look for vary per call, so they go after the static system prompt
+    return HumanMessage(f"Fields to extract: {', '.join(missing_fields)}\n\n{build_context(state)}")
 
+def lead_data_reply(lead_data) -> dict:
+    missing_fields = [key for key, value in lead_data.items() if not value]
+    
     # Check if ALL values are present
-    if all(lead_data.values()):
+    if not missing_fields:
         # All fields have data -> Success
         success_msg = AIMessage(content='Successfully signed-up! Welcome to AutoStream.')
     else:
         # Something is missing -> Identify what is missing
-        missing_fields = [key for key, value in lead_data.items() if not value]
         success_msg = AIMessage(content=f"Could you please provide your {', '.join(missing_fields)} to complete your signup for the test drive?")
         
     return {
@@ -163,38 +275,93 @@ def extract_lead_data(state: State) -> dict:
         'user_data': lead_data
     }
 
-def make_reply_to_enquiry_node(rag_retriever):
+def extract_lead_data(state: State) -> dict:
+    
+    logging.info("Extracting lead data from user messages for test drive booking.")
+    lead_data, ask_llm_for = extract_lead_data_by_rules(state)
+    if ask_llm_for:
+        try:
+            extracted = invoke_llm('extract', lead_extraction_request(state, ask_llm_for), output_schema=LeadValidationModel)
+            new_fields = {key: value for key, value in extracted.model_dump().items() if key in ask_llm_for}
+            lead_data = merge_lead_data(lead_data, new_fields)
+        except Exception as e:
+            # Keep what the rules captured rather than resetting every field
+            logging.info(f"LLM lead extraction failed, keeping rule-based fields: {e}")
+    return lead_data_reply(lead_data)
+
+async def aextract_lead_data(state: State) -> dict:
+    logging.info("Extracting lead data from user messages for test drive booking.")
+    lead_data, ask_llm_for = extract_lead_data_by_rules(state)
+    if ask_llm_for:
+        try:
+            extracted = await ainvoke_llm('extract', lead_extraction_request(state, ask_llm_for),
+                                          output_schema=LeadValidationModel)
+            new_fields = {key: value for key, value in extracted.model_dump().items() if key in ask_llm_for}
+            lead_data = merge_lead_data(lead_data, new_fields)
+        except Exception as e:
+            logging.info(f"LLM lead extraction failed, keeping rule-based fields: {e}")
+    return lead_data_reply(lead_data)
+
+
+def prefetched_retrieval(state: State, query_topic: str):
+    # The retrieval prefetched during classification, when it is for this message
+    retrieval = state.get('retrieval')
+    prefetched = bool(retrieval) and retrieval['query'] == query_topic
+    annotate(retrieval_prefetched=prefetched)
+    return retrieval if prefetched else None
+
+class EnquiryAnswer:
+    """The answer-cache and prompt steps of an inquiry turn, shared by the sync and async nodes."""
+
+    def __init__(self, state: State, retrieval: dict, answer_cache=None):
+        annotate(retrieval_reused=bool(retrieval.get('reused')))
+        # Embed once: the same vector drives retrieval and the answer cache lookup
+        self.state, self.retrieval, self.answer_cache = state, retrieval, answer_cache
+        self.chunk_ids = [chunk['id'] for chunk in retrieval['chunks']]
+        self.customer_name = (state.get('user_data') or {}).get('name')
+        # Follow-ups are checked against the query that found the chunks, not the last one to reuse them
+        self.update = {} if retrieval.get('reused') else {'last_retrieval': retrieval}
+
+    def cached(self):
+        if self.answer_cache is None:
+            return None
+        cached_answer = self.answer_cache.lookup(self.retrieval['embedding'], self.chunk_ids, self.customer_name)
+        annotate(answer_cache_hit=cached_answer is not None)
+        if cached_answer is None:
+            return None
+        return {'messages': [AIMessage(content=cached_answer)], **self.update}
+
+    def prompt(self):
+        context = format_chunks(self.retrieval['chunks'])
+        chat_history = build_context(self.state)
+        # Retrieved context goes after the static system prompt, so the prefix stays cacheable
+        return HumanMessage(f"**RETRIEVED CONTEXT:**\n{context}\n\n{chat_history}")
+
+    def reply(self, response):
+        if self.answer_cache is not None:
+            self.answer_cache.store(self.retrieval['embedding'], self.chunk_ids, response.content, self.customer_name)
+        return {'messages': [response], **self.update}
+
+def make_reply_to_enquiry_node(rag_retriever, answer_cache=None):
     logging.info("Creating node for replying to user enquiries using RAG retriever.")
     
     def reply_to_enquiry(state:State)->State:
         query_topic = get_chat_history(state)[-1]
-        context = rag_retriever.retrieve(query_topic)
-        
-        chat_history = str(get_chat_history(state))
+        retrieval = prefetched_retrieval(state, query_topic) \
+            or retrieve_for_query(rag_retriever, query_topic, state.get('last_retrieval'))
         
-        prompt = [
-            SystemMessage(f"""
-                    **Role:** Royal Enfield Bullet 650 Product Specialist.
-
-                    **Goal:** Provide authoritative answers based on retrieved documentation while driving the user toward booking a test drive.
-
-                    **Instructions:**
-                    1. **RAG Source of Truth:** Use ONLY the provided **Retrieved Context** (Product Specs, Warranty, or Booking Policies). 
-                    2. **Handling Gaps:** If the specific answer isn't in the context, admit it gracefully (e.g., "I don't have the exact spec for that accessory yet") but pivot back to the core legendary features of the 650 Twin engine.
-                    3. **The "Ride-First" Philosophy:** Convert dry technical specs into rider benefits:
-                        - *Instead of:* "52 HP output."
-                        - *Say:* "52 HP of pure, usable power that makes overtaking on highways feel effortless while keeping that classic 'thump' alive."
-                    4. **Tone:** Authentic, rugged, and premium. Treat the user like a fellow rider, not a "lead."
-                    5. **The Close:** Every response must end with a brief, punchy invitation to experience the bike in person (a Test Drive).
-                    
-                    **CAUTION:** Do NOT fabricate answers. Stick to the context.DO NOT make up specs or policies.IF the info is not in the context, admit it and steer back to booking a test drive.
-                    
-                    **RETRIEVED CONTEXT:**
-                    {context}
-                    """),
-            HumanMessage(chat_history)
-        ]
-        
-        state = {'messages':[llm.invoke(prompt)]}
-        return state
-    return reply_to_enquiry
\ No newline at end of file
+        enquiry = EnquiryAnswer(state, retrieval, answer_cache)
+        return enquiry.cached() or enquiry.reply(invoke_llm('inquiry', enquiry.prompt()))
+    return reply_to_enquiry
+
+def make_areply_to_enquiry_node(rag_retriever, answer_cache=None):
+    logging.info("Creating async node for replying to user enquiries using RAG retriever.")
+
+    async def areply_to_enquiry(state:State)->State:
+        query_topic = get_chat_history(state)[-1]
+        retrieval = prefetched_retrieval(state, query_topic) \
+            or await aretrieve_for_query(rag_retriever, query_topic, state.get('last_retrieval'))
+
+        enquiry = EnquiryAnswer(state, retrieval, answer_cache)
+        return enquiry.cached() or enquiry.reply(await ainvoke_llm('inquiry', enquiry.prompt()))
+    return areply_to_enquiry
@@ -0,0 +1,173 @@
+import os
+import json
+import threading
+import numpy as np
+from src.custom_logger import logging
+
+
+class NumpyVectorStore:
+    """
+    Exact in-process vector index for small corpora (a few thousand chunks).
+
+    Embeddings are L2-normalized and stored in `embeddings.npy` (float32, or int8
+    with per-row scales in `scales.npy`); ids, documents and metadata live in a
+    `records.json` sidecar. Queries read the matrix through a read-only memory map,
+    so several worker processes share one copy through the OS page cache, and
+    top-k for a whole batch of queries is a single matrix product.
+
+    Implements the subset of the Chroma collection API the app uses (get, upsert,
+    update, delete, query). Distances are squared L2 between unit vectors, the
+    same scale Chroma reports, so `RAGRetriever` treats both backends alike.
+    """
+
+    def __init__(self, path: str, quantize: bool = False, read_only: bool = False):
+        self.path = path
+        self.quantize = quantize
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._open()
+
+    # ---- storage ----
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _open(self):
+        records_path = self._file('records.json')
+        if os.path.exists(records_path):
+            with open(records_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            self.ids, self.documents, self.metadatas = records['ids'], records['documents'], records['metadatas']
+            self.embeddings = np.load(self._file('embeddings.npy'), mmap_mode='r')
+            self.scales = np.load(self._file('scales.npy'), mmap_mode='r') if records.get('quantized') else None
+        else:
+            self.ids, self.documents, self.metadatas = [], [], []
+            self.embeddings, self.scales = np.zeros((0, 0), dtype=np.float32), None
+        self.index = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        logging.info(f"Opened NumPy vector store at {self.path} with {len(self.ids)} vectors.")
+
+    def _dense(self):
+        # Full-precision copy of the stored vectors, only needed when rewriting
+        if self.scales is not None:
+            return np.asarray(self.embeddings, dtype=np.float32) * np.asarray(self.scales)[:, None]
+        return np.array(self.embeddings, dtype=np.float32)
+
+    def _write(self, embeddings):
+        if self.read_only:
+            raise PermissionError(f"Vector store at {self.path} was opened read-only")
+
+        files = {}
+        if self.quantize and len(embeddings):
+            scales = np.maximum(np.abs(embeddings).max(axis=1), 1e-12) / 127.0
+            files['embeddings.npy'] = np.round(embeddings / scales[:, None]).astype(np.int8)
+            files['scales.npy'] = scales.astype(np.float32)
+        else:
+            files['embeddings.npy'] = embeddings.astype(np.float32)
+
+        # Write new files beside the old ones and swap them in, so readers that
+        # still map the old files keep a consistent view
+        for name, array in files.items():
+            with open(self._file(name + '.tmp'), 'wb') as f:
+                np.save(f, array)
+            os.replace(self._file(name + '.tmp'), self._file(name))
+
+        self._write_records(quantized='scales.npy' in files)
+
+    def _write_records(self, quantized):
+        records = {'ids': self.ids, 'documents': self.documents, 'metadatas': self.metadatas,
+                   'quantized': quantized}
+        with open(self._file('records.json.tmp'), 'w', encoding='utf-8') as f:
+            json.dump(records, f)
+        os.replace(self._file('records.json.tmp'), self._file('records.json'))
+        self._open()
+
+    # ---- collection API ----
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def get(self, ids=None, include=None):
+        selected = self.ids if ids is None else [i for i in ids if i in self.index]
+        result = {
+            'ids': list(selected),
+            'documents': [self.documents[self.index[i]] for i in selected],
+            'metadatas': [self.metadatas[self.index[i]] for i in selected],
+        }
+        if include and 'embeddings' in include:
+            rows = [self.index[i] for i in selected]
+            vectors = np.asarray(self.embeddings[rows], dtype=np.float32)
+            if self.scales is not None:
+                vectors = vectors * np.asarray(self.scales)[rows][:, None]
+            result['embeddings'] = vectors
+        return result
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        new = np.asarray(embeddings, dtype=np.float32)
+        new = new / np.maximum(np.linalg.norm(new, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            dense = self._dense() if len(self.ids) else np.zeros((0, new.shape[1]), dtype=np.float32)
+            rows = []
+            for chunk_id, embedding, metadata, document in zip(ids, new, metadatas, documents):
+                if chunk_id in self.index:
+                    i = self.index[chunk_id]
+                    dense[i] = embedding
+                    self.metadatas[i], self.documents[i] = metadata, document
+                else:
+                    self.index[chunk_id] = len(self.ids)
+                    self.ids.append(chunk_id)
+                    self.metadatas.append(metadata)
+                    self.documents.append(document)
+                    rows.append(embedding)
+            if rows:
+                dense = np.vstack([dense, np.stack(rows)])
+            self._write(dense)
+
+    add = upsert
+
+    def update(self, ids, metadatas):
+        if self.read_only:
+            raise PermissionError(f"Vector store at {self.path} was opened read-only")
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                if chunk_id in self.index:
+                    self.metadatas[self.index[chunk_id]] = metadata
+            # Metadata only: the embedding files stay as they are
+            self._write_records(quantized=self.scales is not None)
+
+    def delete(self, ids):
+        with self._lock:
+            drop = {self.index[i] for i in ids if i in self.index}
+            if not drop:
+                return
+            keep = [i for i in range(len(self.ids)) if i not in drop]
+            dense = self._dense()[keep]
+            self.ids = [self.ids[i] for i in keep]
+            self.documents = [self.documents[i] for i in keep]
+            self.metadatas = [self.metadatas[i] for i in keep]
+            self._write(dense)
+
+    def query(self, query_embeddings, n_results: int = 5):
+        empty = {'ids': [[] for _ in query_embeddings], 'documents': [[] for _ in query_embeddings],
+                 'metadatas': [[] for _ in query_embeddings], 'distances': [[] for _ in query_embeddings]}
+        if not self.ids:
+            return empty
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        # One (batch x N) product scores every query against every chunk
+        scores = queries @ np.asarray(self.embeddings, dtype=np.float32).T
+        if self.scales is not None:
+            scores *= self.scales
+
+        k = min(n_results, len(self.ids))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for row, candidates in zip(scores, top):
+            order = candidates[np.argsort(-row[candidates])]
+            results['ids'].append([self.ids[i] for i in order])
+            results['documents'].append([self.documents[i] for i in order])
+            results['metadatas'].append([self.metadatas[i] for i in order])
+            results['distances'].append([float(2 - 2 * row[i]) for i in order])
+        return results
@@ -0,0 +1,204 @@
+"""
+System prompts for the graph nodes, split into a static prefix and a per-call suffix.
+
+Each prompt's system text never changes between calls; anything that does
+(retrieved context, missing lead fields, the conversation) goes in the
+HumanMessage after it. That keeps the prefix byte-identical so providers can
+cache it. `build_prompts` (called by `build_graph`) creates the SystemMessages
+once and, with GEMINI_CONTEXT_CACHE on, registers the long ones with Gemini's
+context cache; calls for those prompts then send only the suffix.
+"""
+import time
+import threading
+from textwrap import dedent
+from langchain_core.messages import SystemMessage
+from src.config import (
+    GEMINI_MODEL, LLM_PROVIDER, GEMINI_CONTEXT_CACHE, GEMINI_CONTEXT_CACHE_TTL, GEMINI_CONTEXT_CACHE_MIN_TOKENS
+)
+from src.custom_logger import logging
+
+SYSTEM_PROMPTS = {
+    'summarize': dedent("""\
+        **Role:** Conversation Summarizer for a Royal Enfield sales chat.
+        **Goal:** Update the running summary with the new messages.
+
+        **Rules:**
+            - Keep the bike models, questions asked, answers given, objections and booking progress.
+            - Keep any name, contact number, email or city the customer shared.
+            - Plain prose, MAX 5 sentences. No preamble.
+    """),
+    'classify': dedent("""\
+        ### ROLE
+        Expert Intent Classifier for a Bike Dealership.
+
+        ### CATEGORIES
+        - **greeting**: Social openers or pleasantries.
+        - **inquiry**: Questions about bike specs, warranty, or policies requiring document lookup.
+        - **lead**: High-intent actions such as booking a test drive or requesting a quote.
+        - **extract**: Providing contact info, location, or preferred bike model details.
+
+        ### CRITICAL OUTPUT RULE
+        - Output ONLY the category name.
+        - STRICTLY NO JSON, NO preamble, and NO conversational filler.
+
+        ### EXAMPLES
+        User: "Hi there!" -> greeting
+        User: "I want to book a test drive for the X-500 tomorrow." -> lead
+        User: "What is the top speed of the cruiser model?" -> inquiry
+        User: "My phone number is 555-0199." -> extract
+    """),
+    'greeting': dedent("""\
+        **Role:** You are an expert Sales Agent for the all-new Royal Enfield Bullet 650. Your primary objective is to get the user to sign-up for a test drive.
+
+        **Persona:** Professional, passionate about motorcycling heritage, and helpful. Your tone should be "Modern Classic"—reverent of the Bullet’s 90-year legacy but excited about the new 650cc twin engine.
+
+        **Guidelines:**
+        1. **The Greeting:** When the user says "Hello" or greets you, respond warmly and immediately deliver a high-impact sales pitch for the Bullet 650. Focus on the legendary "thump" now paired with 650cc parallel-twin smoothness. End with a call to action to sign up for a test drive.
+        2. **The Value Hook:** provide brief, punchy "value bombs" to entice the user:
+            - Mention the seamless torque of the 650 Twin engine.
+            - Highlight the iconic hand-painted pinstripes and metal build.
+            - Emphasize that it’s the perfect blend of soul and modern reliability.
+        3. **ONLY IF USER WANT TO SIGNUP FOR A TEST DRIVE** As soon as the user agrees sign up for a test drive, you MUST collect:
+            - Full Name
+            - Contact Number
+            - Preferred Location/City
+        4. **Constraint:** Keep responses brief and scannable. No "walls of text." Use bolding for emphasis. Avoid fluff. MAX 3 sentences per response.
+    """),
+    'ask_lead': dedent("""\
+        **Role:** Royal Enfield Test Drive Coordinator
+        **Goal:** Secure a booking for the all-new Bullet 650.
+
+        **Instructions:**
+        1. **The Hook:** Greet the user with a "Modern Classic" vibe. Mention the legendary 650cc twin-engine "thump."
+        2. **Data Collection:** To book the ride, you must collect:
+            - Full Name
+            - Contact Number
+            - Preferred Dealership Location
+        3. **Smart Logic:** - If the user hasn't shared anything, ask for all three details excitedly.
+            - If they have shared some info (e.g., "I'm in Delhi"), ask only for Name and Number.
+        4. **Tone:** Rugged, premium, and brief.
+
+        **Additional Instructions:**
+            - Check the chat history below.
+            - Keep it brief and conversational.
+    """),
+    'extract': dedent("""\
+        **Role:** Lead Extraction Engine (Bullet 650)
+        **Goal:** Extract the customer's fields listed under "Fields to extract" from the conversation.
+
+        **Extraction Rules:**
+            - **name**: User's full name (String or null)
+            - **contact**: Email address or Phone number (String or null)
+            - **location**: City, area, or preferred dealership (String or null)
+
+        **Critical Instruction:** If a field was not mentioned, set its value to null. Never guess.
+    """),
+    'inquiry': dedent("""\
+        **Role:** Royal Enfield Bullet 650 Product Specialist.
+
+        **Goal:** Provide authoritative answers based on retrieved documentation while driving the user toward booking a test drive.
+
+        **Instructions:**
+        1. **RAG Source of Truth:** Use ONLY the **RETRIEVED CONTEXT** given with the conversation (Product Specs, Warranty, or Booking Policies).
+        2. **Handling Gaps:** If the specific answer isn't in the context, admit it gracefully (e.g., "I don't have the exact spec for that accessory yet") but pivot back to the core legendary features of the 650 Twin engine.
+        3. **The "Ride-First" Philosophy:** Convert dry technical specs into rider benefits:
+            - *Instead of:* "52 HP output."
+            - *Say:* "52 HP of pure, usable power that makes overtaking on highways feel effortless while keeping that classic 'thump' alive."
+        4. **Tone:** Authentic, rugged, and premium. Treat the user like a fellow rider, not a "lead."
+        5. **The Close:** Every response must end with a brief, punchy invitation to experience the bike in person (a Test Drive).
+
+        **CAUTION:** Do NOT fabricate answers. Stick to the context. DO NOT make up specs or policies. IF the info is not in the context, admit it and steer back to booking a test drive.
+    """),
+}
+
+# Structured-output calls go through a parser chain that cannot carry a cached_content binding
+UNCACHEABLE_PROMPTS = ('extract',)
+
+
+def approx_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+class PromptLibrary:
+    """The nodes' SystemMessages, built once, plus any Gemini context caches registered for them."""
+
+    def __init__(self, context_cache: bool = GEMINI_CONTEXT_CACHE):
+        self.system = {name: SystemMessage(text) for name, text in SYSTEM_PROMPTS.items()}
+        self.context_cache = context_cache and LLM_PROVIDER == 'gemini'
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def register_context_caches(self):
+        # Gemini rejects caches below its minimum size, so short prompts are not attempted
+        if not self.context_cache:
+            return
+        for name, text in SYSTEM_PROMPTS.items():
+            if name in UNCACHEABLE_PROMPTS:
+                continue
+            if approx_tokens(text) < GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+                logging.info(f"Prompt '{name}' (~{approx_tokens(text)} tokens) is below the context cache minimum, sent inline.")
+                continue
+            self._create_cache(name, text)
+
+    def _create_cache(self, name, text):
+        try:
+            from google import genai
+            from google.genai import types
+
+            client = genai.Client()
+            cache = client.caches.create(
+                model=GEMINI_MODEL.split(':', 1)[-1],
+                config=types.CreateCachedContentConfig(
+                    display_name=f"sales-agent-{name}", system_instruction=text, ttl=f"{GEMINI_CONTEXT_CACHE_TTL}s"
+                ),
+            )
+        except Exception as e:
+            # Context caching is an optimisation: on any failure the prompt is sent inline
+            logging.info(f"Could not create a context cache for prompt '{name}', sending it inline: {e}")
+            return None
+        self.caches[name] = (cache.name, time.time() + GEMINI_CONTEXT_CACHE_TTL)
+        logging.info(f"Registered prompt '{name}' as context cache {cache.name}.")
+        return cache.name
+
+    def cache_name(self, name):
+        # Registered cache for the prompt, re-created shortly before it expires
+        entry = self.caches.get(name)
+        if entry is None:
+            return None
+        cache_name, expires_at = entry
+        if time.time() < expires_at - 60:
+            return cache_name
+        with self._lock:
+            if self.caches.get(name) is entry:
+                self.caches.pop(name)
+                return self._create_cache(name, SYSTEM_PROMPTS[name])
+            return self.caches.get(name, (None,))[0]
+
+    def messages(self, name, *suffix):
+        """(prompt messages, cached_content) for one call: the static prefix, then the per-call messages."""
+        cached_content = self.cache_name(name)
+        if cached_content:
+            return list(suffix), cached_content
+        return [self.system[name], *suffix], None
+
+
+prompts = None
+prompts_lock = threading.Lock()
+
+
+def build_prompts() -> PromptLibrary:
+    global prompts
+    with prompts_lock:
+        prompts = PromptLibrary()
+        prompts.register_context_caches()
+    return prompts
+
+def get_prompts() -> PromptLibrary:
+    # Nodes called outside a built graph (scripts, tests) still get the library
+    global prompts
+    if prompts is None:
+        with prompts_lock:
+            if prompts is None:
+                prompts = PromptLibrary()
+                prompts.register_context_caches()
+    return prompts
@@ -0,0 +1,215 @@
+"""
+Batch replay of recorded conversations through the graph, for evaluating prompt
+changes or reprocessing historical chats without the interactive loop.
+
+Input is JSONL, one conversation per line: {"id": "...", "turns": ["user message", ...]}.
+Conversations run concurrently on a bounded pool of workers, each under its own
+thread_id, with the turns of a conversation in order. Output is JSONL, written
+as turns complete: one record per turn (reply, intent, user_data, seconds) and a
+final {"conversation_id": ..., "done": true} record per conversation.
+
+Re-running with the same output file resumes: finished conversations are skipped,
+and an interrupted one continues after the last turn its graph checkpoint holds.
+
+    python -m src.replay benchmarks/conversations.jsonl --output replay.jsonl --workers 8
+
+Set LLM_PROVIDER=fake to replay offline against canned replies.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from langchain_core.messages import HumanMessage
+from src.config import KNOWLEDGE_BASE_PATH, REPLAY_WORKERS
+from src.custom_logger import logging
+
+
+def read_conversations(path: str):
+    # Streams the input; a conversation without an id is named after its line number
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            conversation = json.loads(line)
+            conversation.setdefault('id', f"line-{line_number}")
+            conversation['id'] = str(conversation['id'])
+            yield conversation
+
+def finished_conversations(output_path: str) -> set:
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by the interruption
+                continue
+            if record.get('done'):
+                done.add(record['conversation_id'])
+    return done
+
+
+class ResultWriter:
+    """Appends JSONL records from many workers, flushed per record so a crash loses at most one line."""
+
+    def __init__(self, path: str):
+        self.file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def replay_conversation(graph, writer, run_id, conversation, save_leads=False, stop=None) -> int:
+    """Runs the conversation's remaining turns in order; returns how many were run. Checks `stop` between turns."""
+    config = {'configurable': {'thread_id': f"replay-{run_id}-{conversation['id']}"}}
+    turns = conversation['turns']
+
+    def run_turn(turn, payload):
+        turn_start = time.perf_counter()
+        state = graph.invoke(payload, config)
+        writer.write({
+            'conversation_id': conversation['id'],
+            'turn': turn,
+            'message': turns[turn],
+            'reply': state['messages'][-1].content,
+            'intent': state.get('user_intent'),
+            'user_data': state.get('user_data'),
+            'seconds': round(time.perf_counter() - turn_start, 4),
+        })
+        if save_leads and state.get('user_intent') == 'extract' and state.get('user_data') \
+                and all(state['user_data'].values()):
+            from src.utils import save_lead
+            save_lead(state['user_data'])
+
+    # Turns already in the checkpoint were replayed before an interruption
+    snapshot = graph.get_state(config)
+    completed = sum(isinstance(m, HumanMessage) for m in snapshot.values.get('messages', []))
+    start, ran = time.perf_counter(), 0
+    if completed:
+        logging.info(f"Resuming conversation {conversation['id']} at turn {completed + 1}/{len(turns)}.")
+        if snapshot.next:
+            # The process died mid-turn: finish that turn from its last checkpoint
+            run_turn(completed - 1, None)
+            ran += 1
+
+    for turn in range(completed, len(turns)):
+        if stop is not None and stop.is_set():
+            return ran
+        run_turn(turn, {'messages': [HumanMessage(turns[turn])]})
+        ran += 1
+
+    writer.write({'conversation_id': conversation['id'], 'done': True, 'turns': len(turns),
+                  'seconds': round(time.perf_counter() - start, 4)})
+    return ran
+
+
+def replay(graph, input_path: str, output_path: str, workers: int = REPLAY_WORKERS, run_id: str = None,
+           save_leads: bool = False) -> dict:
+    """
+    Replays every unfinished conversation in `input_path`, appending results to `output_path`.
+    At most two conversations per worker are read ahead, so the input is never held in memory.
+    """
+    run_id = run_id or os.path.splitext(os.path.basename(output_path))[0]
+    done = finished_conversations(output_path)
+    if done:
+        logging.info(f"Skipping {len(done)} conversations already in {output_path}.")
+
+    stats = {'conversations': 0, 'turns': 0, 'skipped': 0, 'failed': 0}
+
+    def unfinished():
+        for conversation in read_conversations(input_path):
+            if conversation['id'] in done:
+                stats['skipped'] += 1
+                continue
+            yield conversation
+
+    remaining = unfinished()
+    writer = ResultWriter(output_path)
+    stop = threading.Event()
+
+    def collect(future, conversation):
+        try:
+            stats['turns'] += future.result()
+            stats['conversations'] += 1
+        except Exception as e:
+            # Left unfinished in the output, so the next run retries it
+            stats['failed'] += 1
+            logging.info(f"Conversation {conversation['id']} failed: {e!r}")
+            writer.write({'conversation_id': conversation['id'], 'error': repr(e)})
+        if stats['conversations'] and stats['conversations'] % 50 == 0:
+            elapsed = time.perf_counter() - start
+            logging.info(f"Replayed {stats['conversations']} conversations ({stats['conversations'] / elapsed:.2f}/s).")
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='replay') as pool:
+            def submit(conversation):
+                future = pool.submit(replay_conversation, graph, writer, run_id, conversation, save_leads, stop)
+                pending[future] = conversation
+
+            pending = {}
+            try:
+                for conversation in itertools.islice(remaining, 2 * workers):
+                    submit(conversation)
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        collect(future, pending.pop(future))
+                        for conversation in itertools.islice(remaining, 1):
+                            submit(conversation)
+            except KeyboardInterrupt:
+                # Conversations in flight stop after their current turn; the checkpoint keeps them resumable
+                stop.set()
+                for future in pending:
+                    future.cancel()
+                raise
+    finally:
+        writer.close()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['conversations_per_s'] = stats['conversations'] / stats['seconds'] if stats['seconds'] else 0.0
+    stats['turns_per_s'] = stats['turns'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="conversations JSONL")
+    parser.add_argument('--output', required=True, help="results JSONL; an existing file is resumed")
+    parser.add_argument('--workers', type=int, default=REPLAY_WORKERS, help="conversations replayed concurrently")
+    parser.add_argument('--run-id', default=None, help="thread_id prefix (default: the output file name)")
+    parser.add_argument('--save-leads', action='store_true', help="store completed leads in the lead store")
+    args = parser.parse_args()
+
+    from src.vector_store import init_vector_db
+    from src.retriever import RAGRetriever
+    from src.graph import build_graph
+
+    db, embedding_manager = init_vector_db(KNOWLEDGE_BASE_PATH)
+    graph = build_graph(RAGRetriever(db, embedding_manager))
+
+    try:
+        stats = replay(graph, args.input, args.output, args.workers, args.run_id, args.save_leads)
+    except KeyboardInterrupt:
+        sys.exit(f"\nInterrupted; run the same command again to resume from {args.output}.")
+
+    print(f"Replayed {stats['conversations']} conversations ({stats['turns']} turns) in {stats['seconds']:.1f}s: "
+          f"{stats['conversations_per_s']:.2f} conversations/s, {stats['turns_per_s']:.2f} turns/s. "
+          f"Skipped {stats['skipped']} already finished, {stats['failed']} failed.")
+
+
+if __name__ == "__main__":
+    main()
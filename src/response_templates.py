@@ -0,0 +1,192 @@
+"""
+Pre-generated replies for the greeting and lead-prompt nodes.
+
+Those nodes mostly produce a templated sales pitch or a request for whichever of
+name / contact / location is still missing, so a pool of variants is generated
+offline and served instead of a live LLM call. A reply is picked by slot (the
+node, plus the opening/follow-up turn for greetings or the set of missing fields
+for lead prompts) and rotated so a conversation does not see the same text twice.
+Messages with a question or more than RESPONSE_TEMPLATE_MAX_WORDS words need a
+personal answer and still go to the LLM, and greeting templates only answer plain
+hellos, thanks and goodbyes: "too expensive" or "not interested" also land on the
+greeting node, and a canned welcome would ignore them.
+
+Templates may contain {name} or {location} in slots where that field is known.
+
+    python -m src.response_templates build [--variants 6] [--output path]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import threading
+from itertools import combinations
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import AIMessage, HumanMessage
+from src.config import (
+    RESPONSE_TEMPLATES, RESPONSE_TEMPLATES_PATH, RESPONSE_TEMPLATE_MAX_WORDS, RESPONSE_TEMPLATE_VARIANTS,
+    LLM_MAX_CONCURRENCY
+)
+from src.custom_logger import logging
+
+LEAD_FIELDS = ('contact', 'location', 'name')
+FIELD_LABELS = {'name': 'full name', 'contact': 'contact number', 'location': 'preferred city or dealership'}
+# A message made only of pleasantries, the kind a canned greeting answers
+PLEASANTRY_RE = re.compile(
+    r"^\W*(?:(?:hi+|hello+|hey+|hiya|namaste|good (?:morning|afternoon|evening|day)|thanks?(?: you)?(?: so much)?"
+    r"|thx|ty|cheers|ok(?:ay)?|cool|great|nice|awesome|got it|bye|goodbye|see you|have a (?:nice|good|great) day)"
+    r"(?: there)?\W*)+$",
+    re.I
+)
+
+
+def missing_fields(state) -> list:
+    user_data = state.get('user_data') or {}
+    return [field for field in LEAD_FIELDS if not user_data.get(field)]
+
+def slot_for(node: str, state):
+    if node == 'greeting':
+        opening = not any(isinstance(m, AIMessage) for m in state['messages'][:-1])
+        return 'greeting:opening' if opening else 'greeting:followup'
+    missing = missing_fields(state)
+    # Nothing left to ask for: the reply has to respond to what the customer said
+    return f"ask_lead:{'+'.join(missing)}" if missing else None
+
+def all_slots() -> list:
+    slots = ['greeting:opening', 'greeting:followup']
+    for size in range(len(LEAD_FIELDS), 0, -1):
+        slots += [f"ask_lead:{'+'.join(fields)}" for fields in combinations(LEAD_FIELDS, size)]
+    return slots
+
+def needs_personalization(message: str, max_words: int = RESPONSE_TEMPLATE_MAX_WORDS, node: str = '') -> bool:
+    if node == 'greeting' and not PLEASANTRY_RE.match(message):
+        return True
+    return '?' in message or len(message.split()) > max_words
+
+def fill(template: str, user_data) -> str:
+    for field in ('name', 'location'):
+        value = (user_data or {}).get(field)
+        if value:
+            template = template.replace(f"{{{field}}}", value)
+    return template
+
+
+class ResponseTemplates:
+    """Rotating pool of pre-generated replies per slot, with template vs LLM usage counts."""
+
+    def __init__(self, path: str = RESPONSE_TEMPLATES_PATH, enabled: bool = RESPONSE_TEMPLATES,
+                 max_words: int = RESPONSE_TEMPLATE_MAX_WORDS):
+        self.path = path
+        self.enabled = enabled
+        self.max_words = max_words
+        self.pool = {}
+        self.cursors = {}
+        self.stats = {'template': 0, 'llm': 0}
+        self._lock = threading.Lock()
+        if enabled:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.pool = {slot: variants for slot, variants in json.load(f)['slots'].items() if variants}
+        except (OSError, ValueError, KeyError) as e:
+            logging.info(f"No response templates loaded from {self.path}, every reply uses the LLM: {e}")
+            self.pool = {}
+            return
+        logging.info(f"Loaded {sum(map(len, self.pool.values()))} response templates for {len(self.pool)} slots.")
+
+    def _usable(self, node, state):
+        if not self.enabled or not self.pool:
+            return None
+        slot = slot_for(node, state)
+        if slot not in self.pool or needs_personalization(state['messages'][-1].content, self.max_words, node):
+            return None
+        return slot
+
+    def select(self, node: str, state):
+        """A template reply for this turn, or None when the node should call the LLM."""
+        slot = self._usable(node, state)
+        if slot is None:
+            with self._lock:
+                self.stats['llm'] += 1
+            return None
+
+        variants = self.pool[slot]
+        used = {m.content for m in state['messages'] if isinstance(m, AIMessage)}
+        user_data = state.get('user_data')
+        with self._lock:
+            start = self.cursors.get(slot, 0)
+            # Round-robin across sessions, skipping replies this conversation has already seen
+            for offset in range(len(variants)):
+                reply = fill(variants[(start + offset) % len(variants)], user_data)
+                if reply not in used:
+                    break
+            else:
+                offset = 0
+                reply = fill(variants[start % len(variants)], user_data)
+            self.cursors[slot] = (start + offset + 1) % len(variants)
+            self.stats['template'] += 1
+        return reply
+
+    def metrics(self) -> dict:
+        total = self.stats['template'] + self.stats['llm']
+        return {**self.stats, 'template_rate': self.stats['template'] / total if total else 0.0,
+                'enabled': self.enabled, 'slots': len(self.pool)}
+
+
+def describe_slot(slot: str, variant: int) -> str:
+    # Stand-in conversation the node's own system prompt answers when generating the pool
+    node, _, fields = slot.partition(':')
+    if node == 'greeting':
+        situation = ("The customer has just opened the chat with a short greeting." if fields == 'opening' else
+                     "Mid-conversation, the customer sent a short acknowledgement such as 'thanks' or 'ok'.")
+        chat = "human: hello" if fields == 'opening' else "bot: (earlier answer)\nhuman: thanks!"
+    else:
+        missing = fields.split('+')
+        known = [field for field in LEAD_FIELDS if field not in missing]
+        situation = (f"The customer wants a test drive. Still needed: {', '.join(FIELD_LABELS[f] for f in missing)}. "
+                     f"Already shared: {', '.join(FIELD_LABELS[f] for f in known) or 'nothing'}. Ask only for what is still needed.")
+        placeholders = [f"{{{f}}}" for f in ('name', 'location') if f in known]
+        if placeholders:
+            situation += f" You may use the literal placeholder(s) {' '.join(placeholders)} for the known details."
+        chat = "human: I'd like to book a test drive"
+    return (f"{situation}\nWrite variant {variant + 1} of this reply, worded differently from a stock phrasing. "
+            f"Never invent a name or city.\n\nChat history:\n{chat}")
+
+def build_pool(variants: int = RESPONSE_TEMPLATE_VARIANTS) -> dict:
+    """Generates `variants` replies per slot with each node's own system prompt."""
+    from src.llm import get_gateway
+    from src.prompts import get_prompts
+
+    prompts = get_prompts()
+    jobs = [(slot, i) for slot in all_slots() for i in range(variants)]
+
+    def generate(job):
+        slot, i = job
+        prompt = [prompts.system[slot.split(':')[0]], HumanMessage(describe_slot(slot, i))]
+        return slot, get_gateway().invoke(prompt).content.strip()
+
+    pool = {slot: [] for slot in all_slots()}
+    with ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY) as executor:
+        for slot, reply in executor.map(generate, jobs):
+            if reply and reply not in pool[slot]:
+                pool[slot].append(reply)
+    return pool
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--variants', type=int, default=RESPONSE_TEMPLATE_VARIANTS, help="replies generated per slot")
+    parser.add_argument('--output', default=RESPONSE_TEMPLATES_PATH)
+    args = parser.parse_args()
+
+    pool = build_pool(args.variants)
+    if not any(pool.values()):
+        sys.exit("The LLM returned no usable replies; the template pool was not written.")
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'variants': args.variants, 'slots': pool}, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {sum(map(len, pool.values()))} templates for {len(pool)} slots to {args.output}")
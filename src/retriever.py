@@ -1,38 +1,232 @@
+import re
+import asyncio
+import contextvars
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from src.custom_logger import logging
+from src.tracing import traced, annotate
+from src.lexical_index import BM25Index, tokenize
+from src.context import count_tokens
+from src.config import (
+    HYBRID_RETRIEVAL, RRF_K, RETRIEVAL_CANDIDATES, RETRIEVAL_MIN_COSINE, RETRIEVAL_MIN_LEXICAL_MATCH,
+    RETRIEVAL_ADAPTIVE, RETRIEVAL_MAX_K,
+    RETRIEVAL_SCORE_GAP, RETRIEVAL_CONTEXT_TOKENS, RETRIEVAL_REUSE_SIMILARITY, RETRIEVAL_WORKERS
+)
+
+SPEAKER_PREFIX_RE = re.compile(r"^\s*(?:human|bot):\s*", re.I)
+
+# Vector search and BM25 for async callers, off the event loop
+search_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix='retrieval')
+
+
+def clean_query(query: str) -> str:
+    # Queries built from the chat history arrive as "human: ..."
+    return SPEAKER_PREFIX_RE.sub('', query).strip()
+
+def section_key(chunk):
+    # Chunks of one section (or one PDF page) of a file; other chunks stand alone
+    metadata = chunk['metadata']
+    part = metadata.get('section_header') or metadata.get('page')
+    return (metadata.get('file_source'), part) if part else chunk['id']
+
+def cosine(chunk) -> float:
+    # Back from similarity = 1 / (1 + distance), with distance = 2 - 2 * cosine for unit vectors
+    return 1 - (1 / chunk['similarity'] - 1) / 2
+
+def gap_floor(best: float, gap: float) -> float:
+    # Lowest score within `gap` (a fraction) of the best one
+    return best * (1 - gap) if best > 0 else best
+
+def merge_section(chunks: list) -> dict:
+    # One block per section, in document order, with the repeated "Section: ..." line dropped
+    chunks = sorted(chunks, key=lambda chunk: chunk['metadata'].get('chunk_id', 0))
+    header = chunks[0]['content'].split('\n', 1)[0]
+    parts = [chunks[0]['content']]
+    for chunk in chunks[1:]:
+        first, _, rest = chunk['content'].partition('\n')
+        parts.append(rest if first == header else chunk['content'])
+    best = max(chunks, key=lambda chunk: chunk['similarity'])
+    return {**best, 'id': '+'.join(chunk['id'] for chunk in chunks), 'content': '\n'.join(parts)}
 
 class RAGRetriever:
-    def __init__(self, vector_store, embedding_manager):
+    def __init__(self, vector_store, embedding_manager, lexical_index=None, hybrid: bool = HYBRID_RETRIEVAL,
+                 min_cosine=RETRIEVAL_MIN_COSINE, min_lexical_match: float = RETRIEVAL_MIN_LEXICAL_MATCH,
+                 adaptive: bool = RETRIEVAL_ADAPTIVE,
+                 max_k: int = RETRIEVAL_MAX_K, score_gap: float = RETRIEVAL_SCORE_GAP,
+                 context_tokens: int = RETRIEVAL_CONTEXT_TOKENS, reuse_similarity: float = RETRIEVAL_REUSE_SIMILARITY):
         # Initializing the retriever
         self.vector_store = vector_store
         self.embedding_manager = embedding_manager
+        self.lexical_index = (lexical_index or BM25Index()) if hybrid else None
+        self.min_cosine = min_cosine
+        self.min_lexical_match = min_lexical_match
+        self.adaptive = adaptive
+        self.max_k = max_k
+        self.score_gap = score_gap
+        self.context_tokens = context_tokens
+        self.reuse_similarity = reuse_similarity
 
-    def retrieve(self, query: str, top_k: int = 5) -> str:
-        
+    def _chunk(self, chunk_id, content, metadata, distance) -> dict:
+        # similarity = 1 / (1 + distance)
+        return {
+            'id': chunk_id,
+            'content': content,
+            'source': metadata.get('policy_type', 'Unknown'),
+            'similarity': 1 / (1 + distance),
+            'metadata': metadata
+        }
+
+    def _fetch(self, ids, query_embedding) -> dict:
+        # Chunks found only by BM25: load them and score them against the query like the dense hits
+        stored = self.vector_store.get(ids=ids, include=['documents', 'metadatas', 'embeddings'])
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        chunks = {}
+        for chunk_id, content, metadata, embedding in zip(stored['ids'], stored['documents'], stored['metadatas'],
+                                                          stored['embeddings']):
+            embedding = np.asarray(embedding, dtype=np.float32)
+            cosine = float(query @ embedding / max(np.linalg.norm(embedding), 1e-12))
+            chunks[chunk_id] = self._chunk(chunk_id, content, metadata, 2 - 2 * cosine)
+        return chunks
+
+    @traced('retriever.retrieve')
+    def retrieve_chunks(self, query: str, top_k: int = 5, query_embedding=None) -> list:
+        """
+        Top-k chunks for the query as dicts (id, content, source, similarity, metadata).
+        With a BM25 index, dense and lexical candidates are merged by reciprocal rank
+        fusion; chunks under the similarity floor are dropped unless BM25 matched them
+        strongly (`min_lexical_match` of the query's term weight).
+        Adaptive retrieval ranks up to `max_k` chunks and lets `select_context` decide
+        how many of them are worth sending.
+        """
+
+        query = clean_query(query)
+        if self.adaptive:
+            top_k = max(top_k, self.max_k)
         logging.info(f"Received retrieval query: '{query}' with top_k={top_k}.")
-        # Retrieves documents only if they meet a minimum similarity score.
-        query_embedding = self.embedding_manager.generate_embeddings([query])[0]
-        
+        # Callers that already embedded the query can pass the embedding in
+        if query_embedding is None:
+            query_embedding = self.embedding_manager.embed_query(query)
+
+        candidates = max(top_k, RETRIEVAL_CANDIDATES) if self.lexical_index is not None else top_k
         results = self.vector_store.query(
-            query_embeddings=[query_embedding.tolist()], 
-            n_results=top_k
+            query_embeddings=[np.asarray(query_embedding).tolist()],
+            n_results=candidates
         )
-        
-        if not results['ids'] or not results['documents'][0]:
-            return "No relevant documents found."
 
-        relevant_chunks = []
-        
-        # similarity = 1 / (1 + distance)
-        for i in range(len(results['documents'][0])):
-            distance = results['distances'][0][i]
-            similarity = 1 / (1 + distance) 
-            
-            content = results['documents'][0][i]
-            source = results['metadatas'][0][i].get('policy_type', 'Unknown')
-            relevant_chunks.append(f"[Source: {source} | Confidence: {similarity:.2f}]\n{content}")
-
-        if not relevant_chunks:
-            logging.info("No documents met the similarity threshold.")
-            return "I'm sorry, I couldn't find any specific policy information related to your request."
-
-        return "\n\n---\n\n".join(relevant_chunks)
\ No newline at end of file
+        dense = []
+        if results['ids'] and results['documents'][0]:
+            dense = [
+                self._chunk(chunk_id, content, metadata, distance)
+                for chunk_id, content, metadata, distance in zip(
+                    results['ids'][0], results['documents'][0], results['metadatas'][0], results['distances'][0]
+                )
+            ]
+
+        lexical, fused = [], {}
+        if self.lexical_index is None:
+            chunks = dense[:top_k]
+        else:
+            lexical = self.lexical_index.search(query, candidates)
+            by_id = {chunk['id']: chunk for chunk in dense}
+            missing = [chunk_id for chunk_id, _ in lexical if chunk_id not in by_id]
+            if missing:
+                by_id.update(self._fetch(missing, query_embedding))
+
+            for ranking in ([chunk['id'] for chunk in dense], [chunk_id for chunk_id, _ in lexical]):
+                for rank, chunk_id in enumerate(ranking):
+                    fused[chunk_id] = fused.get(chunk_id, 0.0) + 1 / (RRF_K + rank + 1)
+            ranked = sorted((chunk_id for chunk_id in fused if chunk_id in by_id), key=lambda i: -fused[i])
+            chunks = [by_id[chunk_id] for chunk_id in ranked[:top_k]]
+
+        lexical_scores = dict(lexical)
+        if self.min_cosine is not None:
+            vouched = set()
+            if lexical:
+                floor = self.min_lexical_match * self.lexical_index.query_weight(query)
+                vouched = {chunk_id for chunk_id, score in lexical if score >= floor}
+            chunks = [chunk for chunk in chunks if cosine(chunk) >= self.min_cosine or chunk['id'] in vouched]
+        if self.adaptive:
+            chunks = self.select_context(chunks, fused, lexical_scores)
+
+        annotate(k=top_k, hybrid=self.lexical_index is not None, lexical_hits=len(lexical),
+                 scores=[round(chunk['similarity'], 4) for chunk in chunks])
+        return chunks
+
+    def select_context(self, chunks: list, fused: dict, lexical_scores: dict) -> list:
+        """
+        Trims ranked chunks to the context worth prompting with. A chunk stays if its
+        score is within `score_gap` (a fraction) of the best one: its fused score, or on
+        its own its cosine similarity or BM25 score, since fusion halves the score of a
+        chunk only one side found. Chunks of the same section are then merged into one
+        block, and blocks are added best first while they fit in `context_tokens`. The
+        best block is always kept.
+        """
+        if not chunks:
+            return chunks
+        cosines = {chunk['id']: cosine(chunk) for chunk in chunks}
+        signals = [cosines, fused, lexical_scores]
+        floors = [gap_floor(max(scores.values()), self.score_gap) if scores else None for scores in signals]
+        kept = [chunk for chunk in chunks
+                if any(chunk['id'] in scores and scores[chunk['id']] >= floor for scores, floor in zip(signals, floors))]
+
+        sections = {}
+        for chunk in kept:
+            sections.setdefault(section_key(chunk), []).append(chunk)
+        blocks = [group[0] if len(group) == 1 else merge_section(group) for group in sections.values()]
+
+        selected, used = [], 0
+        for block in blocks:
+            tokens = count_tokens(block['content'])
+            if selected and used + tokens > self.context_tokens:
+                continue
+            selected.append(block)
+            used += tokens
+        annotate(context_chunks=len(selected), context_tokens=used, cut_by_gap=len(chunks) - len(kept),
+                 merged=len(kept) - len(blocks))
+        return selected
+
+    def covers(self, previous: dict, query: str, query_embedding) -> bool:
+        """
+        Whether the chunks of an earlier retrieval in the thread (`previous`, as stored by
+        the inquiry node) can answer this follow-up: one of them contains every term of
+        the query, or the query is nearly the same question as the one that retrieved them.
+        """
+        if not previous or not previous.get('chunks'):
+            return False
+        terms = set(tokenize(clean_query(query)))
+        if terms and any(terms <= set(tokenize(chunk['content'])) for chunk in previous['chunks']):
+            return True
+        query = np.asarray(query_embedding, dtype=np.float32)
+        earlier = np.asarray(previous['embedding'], dtype=np.float32)
+        cosine = float(query @ earlier / max(np.linalg.norm(query) * np.linalg.norm(earlier), 1e-12))
+        return cosine >= self.reuse_similarity
+
+    async def aretrieve_chunks(self, query: str, top_k: int = 5, query_embedding=None) -> list:
+        """
+        Async `retrieve_chunks`. The query is embedded on the embedding batcher's thread
+        and the search runs on a small dedicated pool, so the event loop never blocks and
+        sessions waiting on retrieval hold no thread.
+        """
+        if query_embedding is None:
+            query_embedding = await self.embedding_manager.aembed_query(clean_query(query))
+        # Copy the context so the retrieval span lands in this turn's trace
+        return await asyncio.get_running_loop().run_in_executor(
+            search_pool, contextvars.copy_context().run, self.retrieve_chunks, query, top_k, query_embedding
+        )
+
+    def retrieve(self, query: str, top_k: int = 5) -> str:
+        # Retrieves documents only if they meet a minimum similarity score.
+        return format_chunks(self.retrieve_chunks(query, top_k))
+
+    async def aretrieve(self, query: str, top_k: int = 5) -> str:
+        return format_chunks(await self.aretrieve_chunks(query, top_k))
+
+
+def format_chunks(chunks: list) -> str:
+    # Context block pasted into the inquiry prompt; the order already says which chunk matched best
+    if not chunks:
+        logging.info("No documents met the similarity threshold.")
+        return "I'm sorry, I couldn't find any specific policy information related to your request."
+
+    return "\n\n---\n\n".join(f"[Source: {chunk['source']}]\n{chunk['content']}" for chunk in chunks)
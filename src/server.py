@@ -0,0 +1,210 @@
+import json
+import asyncio
+import weakref
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Form, HTTPException
+from fastapi.responses import Response, StreamingResponse, JSONResponse
+from pydantic import BaseModel
+from langchain_core.messages import HumanMessage, AIMessageChunk
+from twilio.twiml.messaging_response import MessagingResponse
+from src.config import KNOWLEDGE_BASE_PATH, STARTUP_WAIT_TIMEOUT, MULTI_WORKER, ASYNC_GRAPH, SESSION_LOCK_POLL_MAX
+from src.custom_logger import logging
+from src.vector_store import init_vector_db
+from src.retriever import RAGRetriever
+from src.intent_classifier import FastIntentClassifier
+from src.answer_cache import SemanticAnswerCache
+from src.graph import build_graph, STREAMED_NODES
+from src.response_templates import ResponseTemplates
+from src.llm import get_llm, get_gateway
+from src.utils import save_lead, clean_reply, ReplyStreamCleaner
+from src.shared_state import SessionLocks
+
+
+class ChatRequest(BaseModel):
+    session_id: str
+    message: str
+
+class ChatResponse(BaseModel):
+    session_id: str
+    reply: str
+    intent: str
+    lead_captured: bool
+
+
+def warm_up(app: FastAPI):
+    # One vector DB, retriever and compiled graph shared by every session, plus the
+    # embedding model and LLM client loaded ahead of the first turn
+    try:
+        db, embedding_manager = init_vector_db(KNOWLEDGE_BASE_PATH)
+        app.state.retriever = RAGRetriever(db, embedding_manager)
+        app.state.response_templates = ResponseTemplates()
+        # Kept on the app so /metrics can report them
+        app.state.intent_classifier = FastIntentClassifier(embedding_manager)
+        app.state.answer_cache = SemanticAnswerCache()
+        app.state.graph = build_graph(app.state.retriever, answer_cache=app.state.answer_cache,
+                                      response_templates=app.state.response_templates, async_nodes=ASYNC_GRAPH,
+                                      intent_classifier=app.state.intent_classifier)
+        embedding_manager.warm_up()
+        get_llm()
+        logging.info("Server ready to accept sessions.")
+    except Exception as e:
+        app.state.startup_error = repr(e)
+        logging.error(f"Server warm-up failed: {e}")
+    finally:
+        app.state.started.set()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Accept connections right away; /ready reports when warm-up has finished
+    app.state.started = threading.Event()
+    app.state.startup_error = None
+    threading.Thread(target=warm_up, args=(app,), name='warm-up', daemon=True).start()
+    yield
+
+
+app = FastAPI(title="Royal Enfield Sales Agent", lifespan=lifespan)
+
+# Turns of the same session run one at a time; locks disappear once a session goes quiet.
+# With several workers the session is also locked across processes.
+session_locks = weakref.WeakValueDictionary()
+worker_locks = SessionLocks() if MULTI_WORKER else None
+
+
+def thread_id_for(channel: str, caller_id: str) -> str:
+    # Each caller gets its own checkpointer thread, namespaced by channel
+    return f"{channel}:{caller_id.strip()}"
+
+@asynccontextmanager
+async def session_lock(thread_id: str):
+    lock = session_locks.get(thread_id)
+    if lock is None:
+        lock = session_locks[thread_id] = asyncio.Lock()
+    async with lock:
+        if worker_locks is None:
+            yield
+            return
+        # Another worker may be running this session's previous turn. Polled rather than waited
+        # on in a thread: waiting sessions would otherwise fill the default executor that the
+        # checkpointer needs to finish, and release, the turns they are waiting for
+        delay = 0.005
+        while not worker_locks.try_acquire(thread_id):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, SESSION_LOCK_POLL_MAX)
+        try:
+            yield
+        finally:
+            worker_locks.release(thread_id)
+
+async def wait_until_ready():
+    # Requests that arrive during warm-up wait for it instead of failing
+    if not app.state.started.is_set():
+        await asyncio.to_thread(app.state.started.wait, STARTUP_WAIT_TIMEOUT)
+    if not app.state.started.is_set():
+        raise HTTPException(status_code=503, detail="Server is still starting up")
+    if app.state.startup_error:
+        raise HTTPException(status_code=503, detail="Server failed to start")
+
+async def finish_turn(thread_id: str, result: dict) -> dict:
+    lead_captured = bool(result.get('user_data')) and all(result['user_data'].values())
+    # Saved on extraction turns only, not on every later turn of the session; the lead store
+    # upserts by contact, so details sent again (from any worker) update the same row
+    if lead_captured and result.get('user_intent') == 'extract':
+        lead = dict(result['user_data'])
+        await asyncio.to_thread(save_lead, lead)
+        logging.info(f"[{thread_id}] Lead captured successfully: {lead['name']}, {lead['contact']}, {lead['location']}")
+
+    return {
+        'reply': clean_reply(result['messages'][-1].content),
+        'intent': result.get('user_intent', ''),
+        'lead_captured': lead_captured
+    }
+
+async def run_turn(thread_id: str, message: str) -> dict:
+    await wait_until_ready()
+    async with session_lock(thread_id):
+        logging.info(f"[{thread_id}] Client: {message}")
+        result = await app.state.graph.ainvoke(
+            {'messages': [HumanMessage(message)]},
+            config={"configurable": {"thread_id": thread_id}}
+        )
+    return await finish_turn(thread_id, result)
+
+async def stream_turn(thread_id: str, message: str):
+    """Yields ('token', text) while the reply is generated, then ('done', turn)."""
+    cleaner = ReplyStreamCleaner()
+    streamed = False
+    async with session_lock(thread_id):
+        logging.info(f"[{thread_id}] Client: {message}")
+        async for mode, payload in app.state.graph.astream(
+            {'messages': [HumanMessage(message)]},
+            config={"configurable": {"thread_id": thread_id}},
+            stream_mode=["messages", "values"]
+        ):
+            if mode == "values":
+                result = payload
+                continue
+            chunk, metadata = payload
+            if metadata.get('langgraph_node') in STREAMED_NODES and isinstance(chunk, AIMessageChunk) \
+                    and isinstance(chunk.content, str) and chunk.content:
+                streamed = True
+                text = cleaner.feed(chunk.content)
+                if text:
+                    yield 'token', text
+
+    turn = await finish_turn(thread_id, result)
+    if streamed:
+        tail = cleaner.flush()
+        if tail:
+            yield 'token', tail
+    else:
+        # Replies produced without token streaming (cached answers, extraction prompts)
+        yield 'token', turn['reply']
+    yield 'done', turn
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    turn = await run_turn(thread_id_for('web', request.session_id), request.message)
+    return ChatResponse(session_id=request.session_id, **turn)
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    # Server-sent events: one 'token' event per chunk, then a 'done' event with the turn summary
+    await wait_until_ready()
+
+    async def events():
+        async for event, data in stream_turn(thread_id_for('web', request.session_id), request.message):
+            payload = {'text': data} if event == 'token' else {'session_id': request.session_id, **data}
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/twilio/webhook")
+async def twilio_webhook(Body: str = Form(...), From: str = Form(...)):
+    # Twilio SMS/WhatsApp webhook: the sender's number identifies the session
+    turn = await run_turn(thread_id_for('twilio', From), Body)
+    twiml = MessagingResponse()
+    twiml.message(turn['reply'])
+    return Response(content=str(twiml), media_type="application/xml")
+
+@app.get("/health")
+async def health():
+    return {'status': 'ok'}
+
+@app.get("/metrics")
+async def metrics():
+    if not app.state.started.is_set() or app.state.startup_error:
+        return JSONResponse({'status': 'starting'}, status_code=503)
+    return {'embeddings': app.state.retriever.embedding_manager.metrics(), 'llm': get_gateway().metrics(),
+            'response_templates': app.state.response_templates.metrics(),
+            'intent_classifier': app.state.intent_classifier.metrics(), 'answer_cache': app.state.answer_cache.metrics()}
+
+@app.get("/ready")
+async def ready():
+    # Readiness probe: 200 once the index, graph and models are loaded, 503 until then
+    if not app.state.started.is_set():
+        return JSONResponse({'status': 'starting'}, status_code=503)
+    if app.state.startup_error:
+        return JSONResponse({'status': 'failed', 'error': app.state.startup_error}, status_code=503)
+    return {'status': 'ready'}
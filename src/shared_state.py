@@ -0,0 +1,114 @@
+"""
+Cross-process locks for running several server workers against the same files.
+
+`FileLock` serializes a whole operation (syncing the vector index, writing a
+lead) across processes. `SessionLocks` gives each thread_id its own lock across
+processes, so consecutive turns of a session can land on any worker and still run
+one at a time. Both use fcntl; where it is unavailable (Windows) they only lock
+within the process.
+"""
+import os
+import hashlib
+import threading
+from contextlib import contextmanager
+from src.config import SESSION_LOCK_PATH, SESSION_LOCK_STRIPES
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive lock held across threads and processes for the duration of a `with` block."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.Lock()
+        self._fd = None
+
+    def __enter__(self):
+        self._local.acquire()
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._local.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        # Closing the descriptor releases the flock
+        os.close(self._fd)
+        self._fd = None
+        self._local.release()
+
+
+class SessionLocks:
+    """
+    Per-thread_id locks shared by every worker process on the host.
+
+    Each thread_id hashes to one of `stripes` bytes of a lock file and takes a
+    POSIX record lock on that byte. Record locks belong to the process, so a
+    thread lock per stripe orders the threads within it. Two sessions that share
+    a stripe only wait for each other; they never see each other's state.
+    """
+
+    def __init__(self, path: str = SESSION_LOCK_PATH, stripes: int = SESSION_LOCK_STRIPES):
+        self.stripes = stripes
+        self._local = [threading.Lock() for _ in range(stripes)]
+        # Kept open for the life of the process: closing any descriptor of the
+        # file would drop every record lock this process holds on it
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def _stripe(self, thread_id: str) -> int:
+        # A stable hash: every process must map a thread_id to the same byte
+        digest = hashlib.blake2b(thread_id.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') % self.stripes
+
+    def acquire(self, thread_id: str):
+        stripe = self._stripe(thread_id)
+        self._local[stripe].acquire()
+        try:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+        except BaseException:
+            self._local[stripe].release()
+            raise
+
+    def try_acquire(self, thread_id: str) -> bool:
+        # Non-blocking acquire, for callers that poll instead of parking a thread
+        stripe = self._stripe(thread_id)
+        if not self._local[stripe].acquire(blocking=False):
+            return False
+        try:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, stripe)
+        except OSError:
+            # Another process holds the stripe (EAGAIN/EACCES)
+            self._local[stripe].release()
+            return False
+        except BaseException:
+            self._local[stripe].release()
+            raise
+        return True
+
+    def release(self, thread_id: str):
+        stripe = self._stripe(thread_id)
+        if fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+        self._local[stripe].release()
+
+    @contextmanager
+    def hold(self, thread_id: str):
+        self.acquire(thread_id)
+        try:
+            yield
+        finally:
+            self.release(thread_id)
@@ -13,6 +13,10 @@ class State(TypedDict):
     messages: Annotated[list, add_messages]
     user_intent: Literal['lead', 'inquiry', 'greeting', 'extract']
     user_data: UserData
+    summary: str            # rolling summary of turns older than the context window
+    summarized_upto: int    # number of messages already folded into the summary
+    retrieval: Optional[dict]   # chunks prefetched for the latest message while classifying
+    last_retrieval: Optional[dict]  # chunks the last inquiry was answered from, reused by follow-ups
 
 class LeadValidationModel(BaseModel):
     """The schema the LLM must follow"""
@@ -24,12 +28,17 @@ class LeadValidationModel(BaseModel):
 def get_chat_history(state: State):
     return ['human: '+s.content if isinstance(s, HumanMessage) else 'bot: '+s.content for s in state['messages']]
 
+def intent_label(intent_raw: str) -> str:
+    # Maps the classifier LLM's reply ("Extract.", "**lead**", "intent: inquiry") to one of the State labels
+    intent_raw = intent_raw.lower().strip()
+    if 'high-intent' in intent_raw or 'lead' in intent_raw: return 'lead'
+    if 'product' in intent_raw or 'inquiry' in intent_raw: return 'inquiry'
+    if 'extract' in intent_raw: return 'extract'
+    return 'greeting'
+
 def route_based_on_intent(state: State):
-    intent_raw = state['user_intent'].content.lower().strip()
+    intent = intent_label(state['user_intent'])
     
-    logging.info(f"Routing based on intent: {intent_raw}")
+    logging.info(f"Routing based on intent: {intent}")
     
-    if 'high-intent' in intent_raw: return 'lead'
-    if 'product' in intent_raw or 'inquiry' in intent_raw: return 'inquiry'
-    if 'extract' in intent_raw: return 'extract'
-    return 'greeting'   
\ No newline at end of file
+    return intent   
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+Lightweight span tracing for graph turns.
+
+Every graph node, retrieval and embedding call is recorded as a span with wall
+time and attributes (thread_id, turn, token counts, retrieval k and scores, cache
+hits). Spans are handed to a background thread through a bounded queue and
+appended to a JSONL file in TRACE_DIR, one OTLP-style span per line, so the
+request path never blocks on disk.
+
+    python -m src.tracing summarize [traces/*.jsonl]
+"""
+import os
+import sys
+import glob
+import json
+import time
+import queue
+import atexit
+import hashlib
+import inspect
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from langchain_core.runnables import RunnableConfig
+from src.config import TRACING_ENABLED, TRACE_DIR
+
+# Innermost open span and the (thread_id, turn) it belongs to
+current_span = contextvars.ContextVar('current_span', default=None)
+current_turn = contextvars.ContextVar('current_turn', default=None)
+current_node = contextvars.ContextVar('current_node', default=None)
+
+
+class TraceSink:
+    def __init__(self, directory: str = TRACE_DIR, max_queue: int = 10000):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"trace_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{os.getpid()}.jsonl")
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.worker = threading.Thread(target=self._run, name='trace-sink', daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
+
+    def emit(self, record: dict):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never slow a turn down for tracing; count what we lose instead
+            self.dropped += 1
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            while True:
+                record = self.queue.get()
+                if record is None:
+                    break
+                f.write(json.dumps(record, default=str) + "\n")
+                # Drain whatever else is queued before flushing
+                if self.queue.empty():
+                    f.flush()
+
+    def close(self):
+        self.queue.put(None)
+        self.worker.join(timeout=5)
+
+
+sink = None
+
+
+def get_sink():
+    global sink
+    if sink is None:
+        sink = TraceSink()
+    return sink
+
+def annotate(**attributes):
+    """Adds attributes to the innermost open span (no-op outside a span)."""
+    span_record = current_span.get()
+    if span_record is not None:
+        span_record['attributes'].update(attributes)
+
+def add_usage(message):
+    # Accumulates LLM token counts from a chat model response on the current span
+    # and on the enclosing node span, so per-node totals need no joins
+    usage = getattr(message, 'usage_metadata', None)
+    if not usage:
+        return
+    targets = {id(s): s for s in (current_span.get(), current_node.get()) if s is not None}
+    for span_record in targets.values():
+        attributes = span_record['attributes']
+        attributes['prompt_tokens'] = attributes.get('prompt_tokens', 0) + usage.get('input_tokens', 0)
+        attributes['completion_tokens'] = attributes.get('completion_tokens', 0) + usage.get('output_tokens', 0)
+        # Prompt tokens served from the provider's prefix/context cache
+        cached = (usage.get('input_token_details') or {}).get('cache_read', 0)
+        if cached:
+            attributes['cached_prompt_tokens'] = attributes.get('cached_prompt_tokens', 0) + cached
+        attributes['llm_calls'] = attributes.get('llm_calls', 0) + 1
+
+@contextmanager
+def span(name: str, **attributes):
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    parent = current_span.get()
+    turn = current_turn.get() or {}
+    record = {
+        'trace_id': turn.get('trace_id') or (parent or {}).get('trace_id') or secrets.token_hex(16),
+        'span_id': secrets.token_hex(8),
+        'parent_span_id': parent['span_id'] if parent else None,
+        'name': name,
+        'start_time_unix_nano': time.time_ns(),
+        'attributes': {**{k: v for k, v in turn.items() if k != 'trace_id'}, **attributes},
+        'status': 'OK',
+    }
+    token = current_span.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record['status'] = 'ERROR'
+        record['attributes']['error'] = repr(e)
+        raise
+    finally:
+        record['duration_ms'] = (time.perf_counter() - start) * 1000
+        record['end_time_unix_nano'] = time.time_ns()
+        current_span.reset(token)
+        get_sink().emit(record)
+
+def traced(name: str):
+    """Decorator recording every call of the function as a span."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            wrapper = async_wrapper
+        else:
+            def wrapper(*args, **kwargs):
+                with span(name):
+                    return func(*args, **kwargs)
+        wrapper.__name__, wrapper.__doc__ = func.__name__, func.__doc__
+        return wrapper
+    return decorator
+
+def turn_context(state, config) -> dict:
+    thread_id = (config or {}).get('configurable', {}).get('thread_id', '')
+    turn = sum(1 for m in state.get('messages', []) if getattr(m, 'type', '') == 'human')
+    trace_id = hashlib.sha256(f"{thread_id}:{turn}".encode('utf-8')).hexdigest()[:32]
+    return {'thread_id': thread_id, 'turn': turn, 'trace_id': trace_id}
+
+def trace_node(name: str, node):
+    """
+    Wraps a graph node so each run becomes a span tagged with thread_id and turn.
+    Not using functools.wraps on purpose: LangGraph reads the wrapper's signature
+    to decide whether to pass `config`.
+    """
+    if inspect.iscoroutinefunction(node):
+        async def async_traced_node(state, config: RunnableConfig):
+            token = current_turn.set(turn_context(state, config))
+            try:
+                with span(f"node.{name}") as node_span:
+                    node_token = current_node.set(node_span)
+                    try:
+                        return await node(state)
+                    finally:
+                        current_node.reset(node_token)
+            finally:
+                current_turn.reset(token)
+        async_traced_node.__name__ = name
+        return async_traced_node
+
+    def traced_node(state, config: RunnableConfig):
+        token = current_turn.set(turn_context(state, config))
+        try:
+            with span(f"node.{name}") as node_span:
+                node_token = current_node.set(node_span)
+                try:
+                    return node(state)
+                finally:
+                    current_node.reset(node_token)
+        finally:
+            current_turn.reset(token)
+    traced_node.__name__ = name
+    return traced_node
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(paths: list):
+    spans = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    spans.setdefault(record['name'], []).append(record)
+
+    print(f"{'span':<34} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'avg in tok':>10} {'avg cached':>10} {'avg out tok':>11}")
+    for name, records in sorted(spans.items()):
+        durations = [r['duration_ms'] for r in records]
+        prompt = [r['attributes'].get('prompt_tokens', 0) for r in records]
+        cached = [r['attributes'].get('cached_prompt_tokens', 0) for r in records]
+        completion = [r['attributes'].get('completion_tokens', 0) for r in records]
+        print(f"{name:<34} {len(records):>6} {percentile(durations, 50):>9.1f} {percentile(durations, 95):>9.1f} "
+              f"{percentile(durations, 99):>9.1f} {sum(prompt) / len(records):>10.0f} {sum(cached) / len(records):>10.0f} {sum(completion) / len(records):>11.0f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'summarize':
+        sys.exit("usage: python -m src.tracing summarize [trace files...]")
+    files = sys.argv[2:] or sorted(glob.glob(os.path.join(TRACE_DIR, "*.jsonl")))
+    if not files:
+        sys.exit(f"No trace files found in {TRACE_DIR}")
+    summarize(files)
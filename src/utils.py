@@ -1,33 +1,52 @@
-from fastapi import Form
 import re
-import csv
-import json
-from datetime import datetime
-import pandas as pd
-import os
-from src.config import LEADS_FILE
+from src.config import LEADS_DB_PATH
+from src.lead_store import LeadStore
 
+lead_store = None
 
-def save_lead_to_excel(lead_data):
+
+def clean_reply(text: str) -> str:
+    # Collapse markdown emphasis, newlines and tabs into plain single-line text
+    return re.sub(r"[\*\n\t]+", " ", text)
+
+
+class ReplyStreamCleaner:
     """
-    Appends a dictionary of lead data to an Excel file.
+    Incremental `clean_reply` for streamed tokens. A run of `*`, newline or tab
+    characters can span chunk boundaries, so it is held back until the next
+    visible character (or `flush`) and then emitted as a single space.
     """
-    # Add a timestamp to the data
-    lead_data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Create a DataFrame for the new single row
-    new_row_df = pd.DataFrame([lead_data])
-    
-    if not os.path.exists(LEADS_FILE):
-        # File doesn't exist: Create it with headers
-        new_row_df.to_excel(LEADS_FILE, index=False, engine='openpyxl')
-    else:
-        # File exists: Append to it
-        # We read existing data first (safest way for Excel)
-        existing_df = pd.read_excel(LEADS_FILE)
-        updated_df = pd.concat([existing_df, new_row_df], ignore_index=True)
-        updated_df.to_excel(LEADS_FILE, index=False, engine='openpyxl')
+
+    def __init__(self):
+        self.in_run = False
+
+    def feed(self, chunk: str) -> str:
+        out = []
+        for char in chunk:
+            if char in "*\n\t":
+                self.in_run = True
+                continue
+            if self.in_run:
+                out.append(" ")
+                self.in_run = False
+            out.append(char)
+        return "".join(out)
+
+    def flush(self) -> str:
+        tail = " " if self.in_run else ""
+        self.in_run = False
+        return tail
+
+
+def save_lead(lead_data):
+    """
+    Records a captured lead in the lead store. A lead with an already known
+    contact is merged into the existing row instead of being appended.
+    """
+    global lead_store
+    if lead_store is None:
+        lead_store = LeadStore()
+
+    lead_store.save(lead_data)
         
-    print(f"💾 Saved lead to {LEADS_FILE}")
-    
-    
\ No newline at end of file
+    print(f"💾 Saved lead to {LEADS_DB_PATH}")
@@ -1,65 +1,245 @@
 import time
 import os
 import json
-import chromadb
+import hashlib
+import queue
+import threading
+import itertools
 import re
+import asyncio
+import multiprocessing
 import numpy as np
 from src.custom_logger import logging
-from typing import List
+from typing import List, Protocol
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
 from langchain_core.documents import Document
-from sentence_transformers import SentenceTransformer
-from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    PyPDFLoader, 
-    TextLoader, 
-    UnstructuredMarkdownLoader
+from src.config import (
+    VECTOR_DB_PATH, EMBEDDING_MODEL, MANIFEST_PATH, VECTOR_BACKEND, VECTOR_QUANTIZE, INGEST_WORKERS, EMBED_BATCH_SIZE,
+    HYBRID_RETRIEVAL, EMBED_CACHE_SIZE, EMBED_MAX_BATCH, EMBED_BATCH_WAIT_MS, MULTI_WORKER, INDEX_LOCK_PATH
 )
-from src.config import VECTOR_DB_PATH, EMBEDDING_MODEL
+from src.numpy_store import NumpyVectorStore
+from src.lexical_index import BM25Index
+from src.shared_state import FileLock
+from src.tracing import traced, annotate, span
+
+class VectorStore(Protocol):
+    """
+    What the indexer and RAGRetriever need from a vector store backend. A Chroma
+    collection satisfies it as-is; `NumpyVectorStore` is the in-process alternative.
+    """
+    def get(self, ids=None, include=None) -> dict: ...
+    def upsert(self, ids, embeddings, metadatas, documents): ...
+    def update(self, ids, metadatas): ...
+    def delete(self, ids): ...
+    def query(self, query_embeddings, n_results: int) -> dict: ...
+
+class QueryBatcher:
+    """
+    Coalesces single-query encodes from concurrent sessions. Under concurrency the
+    first query waits up to `max_wait` seconds for others to arrive, then the whole
+    batch (at most `max_batch` texts) goes through one `encode` call and each caller
+    gets its own row back.
+    """
+
+    def __init__(self, encode, max_batch: int, max_wait: float):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = queue.Queue()
+        self.stats = {'batches': 0, 'queries': 0}
+        self.last_batch = 1
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, text: str) -> Future:
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                    self._worker.start()
+        future = Future()
+        self.pending.put((text, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            # A lone query with no recent concurrency is encoded straight away;
+            # otherwise hold the batch open for up to max_wait
+            wait = self.max_wait if (self.pending.qsize() or self.last_batch > 1) else 0
+            deadline = time.monotonic() + wait
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    batch.append(self.pending.get(timeout=remaining) if remaining > 0 else self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            self.last_batch = len(batch)
+
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                rows = dict(zip(texts, self.encode(texts)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats['batches'] += 1
+            self.stats['queries'] += len(batch)
+            for text, future in batch:
+                future.set_result((rows[text], len(texts)))
+
 
 class EmbeddingManager:
-    def __init__(self, model_name: str = EMBEDDING_MODEL):
+    def __init__(self, model_name: str = EMBEDDING_MODEL, cache_size: int = EMBED_CACHE_SIZE,
+                 max_batch: int = EMBED_MAX_BATCH, batch_wait_ms: float = EMBED_BATCH_WAIT_MS):
         self.model_name = model_name
         self.model = None
+        self._load_lock = threading.Lock()
         logging.info("Initializing Embedding Manager with model: %s", self.model_name)
-        
-        self._load_model()
+
+        # LRU of query embeddings keyed by normalized text
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self.stats = {'cache_hits': 0, 'cache_misses': 0}
+        self.batcher = QueryBatcher(self._encode_loaded, max_batch, batch_wait_ms / 1000)
 
     def _load_model(self):
-        # Loading the model
-        try:
-            print(f"Loading embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
-        except Exception as e:
-            print(f"Error loading model {self.model_name}: {e}")
-            raise
-    
+        # The model (and torch) is only loaded on first use or by warm_up()
+        with self._load_lock:
+            if self.model is not None:
+                return
+            try:
+                from sentence_transformers import SentenceTransformer
+                print(f"Loading embedding model: {self.model_name}")
+                self.model = SentenceTransformer(self.model_name)
+            except Exception as e:
+                print(f"Error loading model {self.model_name}: {e}")
+                raise
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts)
+
+    def _encode_loaded(self, texts: List[str]) -> np.ndarray:
+        if self.model is None:
+            self._load_model()
+        return self._encode(texts)
+
+    def warm_up(self):
+        # Loads the model and runs one encode so the first real query pays no setup cost
+        with span('embeddings.warm_up'):
+            self._load_model()
+            self._encode(["warm up"])
+
+    @traced('embeddings.generate')
     def generate_embeddings(self, texts: List[str]) -> np.ndarray:
-        if not self.model:
-            raise ValueError("Model not loaded")
-        embeddings = self.model.encode(texts)
-        return embeddings
+        annotate(batch_size=len(texts))
+        return self._encode_loaded(texts)
+
+    def _cached(self, key: str):
+        with self._cache_lock:
+            embedding = self.cache.get(key)
+            if embedding is not None:
+                self.cache.move_to_end(key)
+                self.stats['cache_hits'] += 1
+                annotate(cache_hit=True)
+                return embedding
+            self.stats['cache_misses'] += 1
+
+    def _remember(self, key: str, row, batch_size: int) -> np.ndarray:
+        embedding = np.array(row, dtype=np.float32)
+        embedding.setflags(write=False)
+        annotate(cache_hit=False, batch_size=batch_size)
+        with self._cache_lock:
+            self.cache[key] = embedding
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return embedding
+
+    @traced('embeddings.query')
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embedding of one query, from the LRU cache or a micro-batched encode."""
+        key = " ".join(text.lower().split())
+        embedding = self._cached(key)
+        if embedding is not None:
+            return embedding
+        return self._remember(key, *self.batcher.submit(key).result())
+
+    @traced('embeddings.query')
+    async def aembed_query(self, text: str) -> np.ndarray:
+        """
+        Async `embed_query`: the encode runs on the batcher's own thread, so the event
+        loop only waits on its future and no other thread is taken per query.
+        """
+        key = " ".join(text.lower().split())
+        embedding = self._cached(key)
+        if embedding is not None:
+            return embedding
+        return self._remember(key, *await asyncio.wrap_future(self.batcher.submit(key)))
+
+    def metrics(self) -> dict:
+        lookups = self.stats['cache_hits'] + self.stats['cache_misses']
+        batches = self.batcher.stats['batches']
+        return {
+            **self.stats,
+            'cache_hit_rate': self.stats['cache_hits'] / lookups if lookups else 0.0,
+            'cache_entries': len(self.cache),
+            'batches': batches,
+            'avg_batch_size': self.batcher.stats['queries'] / batches if batches else 0.0,
+        }
+
+SUPPORTED_EXTENSIONS = ('.txt', '.md', '.pdf')
 
 def load_any_document(file_path):
-    """Selects the correct loader based on file extension."""
+    """
+    Selects the correct loader based on file extension. Yields documents (one per PDF page) lazily.
+    Text and Markdown are read directly; only PDFs need the optional langchain_community/pypdf loader.
+    """
     ext = os.path.splitext(file_path)[1].lower()
     if ext == ".pdf":
-        return PyPDFLoader(file_path).load()
-    elif ext == ".md":
-        return UnstructuredMarkdownLoader(file_path).load()
-    elif ext == ".txt":
-        return TextLoader(file_path).load()
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(file_path).lazy_load()
+    elif ext in (".txt", ".md"):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        if ext == ".md":
+            # Drop heading markers so "## 1. Refunds" splits like a numbered section
+            content = re.sub(r'^#+\s*', '', content, flags=re.M)
+        return [Document(page_content=content, metadata={'source': file_path})]
     else:
         return []
+
+def discover_documents(folder: str) -> list:
+    # Every file in the knowledge base that load_any_document can read
+    return sorted(f for f in os.listdir(folder) if os.path.splitext(f)[1].lower() in SUPPORTED_EXTENSIONS)
     
-def load_and_split_data(DOCS_FOLDER: str) -> list:
+def split_pdf(file_path: str, splitter) -> list:
+    # Page by page, so only one page of a large manual is held as raw text at a time
+    filename = os.path.basename(file_path)
+    doc_chunks = []
+    for page in load_any_document(file_path):
+        for doc in splitter.split_documents([Document(page_content=page.page_content)]):
+            doc.metadata.update({
+                "policy_type": os.path.splitext(filename)[0].replace("_", " ").title(),
+                "file_source": filename,
+                "page": page.metadata.get('page', 0) + 1,
+                "chunk_id": len(doc_chunks),
+                "strategy": "recursive_fallback",
+                "last_updated": time.ctime(os.path.getmtime(file_path))
+            })
+            doc_chunks.append(doc)
+    return doc_chunks
+
+def split_document(file_path: str) -> list:
     """
-    Loads text files and chunks them using a Context-Aware Strategy:
+    Chunks a single document (txt, md or pdf) using a Context-Aware Strategy:
     1. Tries to split by Numbered Headers (e.g., "1. POLICY") and injects context.
     2. Falls back to Recursive Splitting if no headers are found.
+    PDFs are split page by page with the recursive splitter.
     """
-    
-    final_chunks = []
+    filename = os.path.basename(file_path)
     
     # Fallback splitter for unstructured files
     fallback_splitter = RecursiveCharacterTextSplitter(
@@ -68,103 +248,325 @@ def load_and_split_data(DOCS_FOLDER: str) -> list:
         separators=["\n\n", "\n", ". ", " ", ""]
     )
 
-    for filename in os.listdir(DOCS_FOLDER):
-        if not filename.endswith(".txt"):
-            continue
+    # Loader errors propagate: an unreadable file is not the same as an empty one
+    logging.info("Loading %s...", filename)
+    if filename.lower().endswith('.pdf'):
+        return split_pdf(file_path, fallback_splitter)
+    content = "\n".join(doc.page_content for doc in load_any_document(file_path))
 
-        file_path = os.path.join(DOCS_FOLDER, filename)
-        
-        try:
-            logging.info("Loading %s...", filename)
+    # Context-Aware Splitting (Secion Numbers)
+    # Regex looks for "\n1. " to capture the header.
+    sections = re.split(r'\n(\d+\.\s.*)', content)
+    
+    doc_chunks = []
+    policy_category = os.path.splitext(filename)[0].replace("_", " ").title()
+    document_title = content.split('\n')[0].strip() # Assume first line is title
+    
+    logging.info(f"Chunking the {filename} file content...")
+    
+    
+    # If regex found sections (Length > 1 means split was successful)
+    if len(sections) > 1:
+        # sections[0] is usually intro text, skip it or treat as intro
+        # Loop starts from 1 and steps by 2 because regex split keeps delimiters
+        for i in range(1, len(sections), 2):
+            header = sections[i].strip()       # e.g. "1. REFUND PROCESS"
+            body = sections[i+1].strip() if i+1 < len(sections) else ""
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except Exception as e:
-            logging.info(f"Error reading {filename}: {e}")
-            continue
-
-        # Context-Aware Splitting (Secion Numbers)
-        # Regex looks for "\n1. " to capture the header.
-        sections = re.split(r'\n(\d+\.\s.*)', content)
-        
-        doc_chunks = []
-        policy_category = filename.replace("_", " ").replace(".txt", "").title()
-        document_title = content.split('\n')[0].strip() # Assume first line is title
-        
-        logging.info(f"Chunking the {filename} file content...")
-        
-        
-        # If regex found sections (Length > 1 means split was successful)
-        if len(sections) > 1:
-            # sections[0] is usually intro text, skip it or treat as intro
-            # Loop starts from 1 and steps by 2 because regex split keeps delimiters
-            for i in range(1, len(sections), 2):
-                header = sections[i].strip()       # e.g. "1. REFUND PROCESS"
-                body = sections[i+1].strip() if i+1 < len(sections) else ""
-                
-                enriched_text = (
-                    f"Section: {header}\n"
-                    f"Content: {body}"
-                )
-                
-                doc = Document(
-                    page_content=enriched_text,
-                    metadata={
-                        "policy_type": policy_category,
-                        "file_source": filename,
-                        'document_title': document_title,
-                        "section_header": header,
-                        "chunk_id": i // 2, # simple counter
-                        "strategy": "header_injection",
-                        "last_updated": time.ctime(os.path.getmtime(file_path))
-                    }
-                )
-                doc_chunks.append(doc)
-                
-        # --- STRATEGY 2: Fallback (Standard Recursive Splitting) ---
-        else:
-            print(f"No numbered sections found in {filename}. Using standard splitter.")
-            raw_doc = Document(page_content=content, metadata={"source": filename})
-            split_docs = fallback_splitter.split_documents([raw_doc])
+            enriched_text = (
+                f"Section: {header}\n"
+                f"Content: {body}"
+            )
             
-            for i, doc in enumerate(split_docs):
-                doc.metadata.update({
+            doc = Document(
+                page_content=enriched_text,
+                metadata={
                     "policy_type": policy_category,
                     "file_source": filename,
-                    "chunk_id": i,
-                    "strategy": "recursive_fallback",
+                    'document_title': document_title,
+                    "section_header": header,
+                    "chunk_id": i // 2, # simple counter
+                    "strategy": "header_injection",
                     "last_updated": time.ctime(os.path.getmtime(file_path))
-                })
-                doc_chunks.append(doc)
+                }
+            )
+            doc_chunks.append(doc)
+            
+    # --- STRATEGY 2: Fallback (Standard Recursive Splitting) ---
+    else:
+        print(f"No numbered sections found in {filename}. Using standard splitter.")
+        raw_doc = Document(page_content=content, metadata={"source": filename})
+        split_docs = fallback_splitter.split_documents([raw_doc])
+        
+        for i, doc in enumerate(split_docs):
+            doc.metadata.update({
+                "policy_type": policy_category,
+                "file_source": filename,
+                "chunk_id": i,
+                "strategy": "recursive_fallback",
+                "last_updated": time.ctime(os.path.getmtime(file_path))
+            })
+            doc_chunks.append(doc)
+
+    return doc_chunks
+
+class IngestStats:
+    # Throughput of one sync: files parsed (and failed), pages, chunks and embeddings
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.files = self.failed = self.pages = self.chunks = self.embedded = 0
+        self.embed_seconds = 0.0
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        embed_rate = self.embedded / self.embed_seconds if self.embed_seconds else 0.0
+        failed = f", {self.failed} failed to parse" if self.failed else ""
+        return (f"Ingested {self.files} files ({self.pages} pages, {self.chunks} chunks){failed} in {elapsed:.2f}s: "
+                f"{self.pages / elapsed:.1f} pages/s, {self.chunks / elapsed:.1f} chunks/s, {embed_rate:.1f} embeddings/s")
+
+def parse_document(file_path: str) -> tuple:
+    # Process pool worker: (file_path, chunks, pages), with chunks None if the file could not be read
+    try:
+        docs = split_document(file_path)
+    except Exception as e:
+        logging.info(f"Error reading {os.path.basename(file_path)}: {e}")
+        return file_path, None, 0
+    pages = len({doc.metadata['page'] for doc in docs if 'page' in doc.metadata}) or 1
+    return file_path, docs, pages
+
+def iter_parsed_documents(file_paths: list, workers: int = INGEST_WORKERS):
+    """
+    Parses and chunks documents in a process pool, yielding results as files finish.
+    At most two files per worker are in flight, so chunks of a large knowledge base
+    are never all held in memory at once.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(file_paths))
+    if workers < 2:
+        yield from map(parse_document, file_paths)
+        return
 
-        final_chunks.extend(doc_chunks)
+    # Not fork: the server syncs from its warm-up thread while other threads run, and a forked
+    # child can inherit their locks held. Workers import this module fresh instead.
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as pool:
+        pending, queued = set(), iter(file_paths)
+        for file_path in itertools.islice(queued, 2 * workers):
+            pending.add(pool.submit(parse_document, file_path))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                for file_path in itertools.islice(queued, 1):
+                    pending.add(pool.submit(parse_document, file_path))
 
-    print(f"Processed {len(os.listdir(DOCS_FOLDER))} files into {len(final_chunks)} high-quality chunks.")
-    logging.info(f"Processed {len(os.listdir(DOCS_FOLDER))} files into {len(final_chunks)} high-quality chunks.")
+def load_and_split_data(DOCS_FOLDER: str) -> list:
+    """Loads and chunks every supported file in the folder (see `split_document`)."""
+    
+    final_chunks = []
+    file_paths = [os.path.join(DOCS_FOLDER, f) for f in discover_documents(DOCS_FOLDER)]
+
+    for _, docs, _ in iter_parsed_documents(file_paths):
+        final_chunks.extend(docs or [])
+
+    print(f"Processed {len(file_paths)} files into {len(final_chunks)} high-quality chunks.")
+    logging.info(f"Processed {len(file_paths)} files into {len(final_chunks)} high-quality chunks.")
     
     return final_chunks
-def init_vector_db(knowledge_base_path):
-    embedding_manager = EmbeddingManager()
-    logging.info('Initializing vector database...')
+
+def hash_file(file_path: str) -> str:
+    # Content hash of a source document, used to skip unchanged files
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def chunk_ids_for(docs: list) -> list:
+    """
+    Content-addressed ids for the chunks of one file. Identical text in the same
+    file always maps to the same id, so unchanged chunks never need re-embedding.
+    """
+    ids, seen = [], {}
+    for doc in docs:
+        base = hashlib.sha256(
+            f"{doc.metadata['file_source']}\0{doc.page_content}".encode('utf-8')
+        ).hexdigest()[:32]
+        # Duplicate chunks within a file get an occurrence suffix
+        seen[base] = seen.get(base, 0) + 1
+        ids.append(base if seen[base] == 1 else f"{base}-{seen[base]}")
+    return ids
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.info(f"Ignoring unreadable index manifest {path}: {e}")
+        return {}
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    # Write to a temp file first so a crash never leaves a half-written manifest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def sync_vector_db(db, embedding_manager, knowledge_base_path, backend: str = VECTOR_BACKEND,
+                   batch_size: int = EMBED_BATCH_SIZE, lexical_index=None) -> dict:
+    """
+    Brings the collection in line with the knowledge base using the manifest of
+    per-file and per-chunk content hashes. Only new or changed chunks are embedded;
+    chunks of edited or deleted files are removed. The BM25 index, if given, gets
+    the same additions and removals. Returns the updated manifest.
+    """
+    manifest = load_manifest()
+    if manifest.get('embedding_model') != embedding_manager.model_name \
+            or manifest.get('backend', 'chroma') != backend:
+        # No manifest (or a different model/backend): drop whatever is in the collection,
+        # including the legacy positional ids, and rebuild from scratch.
+        stale_ids = db.get(include=[])['ids']
+        if stale_ids:
+            logging.info(f"Index manifest missing or outdated, clearing {len(stale_ids)} stored chunks.")
+            db.delete(ids=stale_ids)
+        if lexical_index is not None:
+            lexical_index.clear()
+        manifest = {'embedding_model': embedding_manager.model_name, 'backend': backend, 'files': {}}
+
+    indexed_files = manifest['files']
+    current_files = discover_documents(knowledge_base_path)
+
+    changed_paths, hashes = [], {}
+    for filename in current_files:
+        file_path = os.path.join(knowledge_base_path, filename)
+        hashes[filename] = hash_file(file_path)
+        entry = indexed_files.get(filename)
+        # Files that produced no chunks are parsed again, in case an earlier sync failed to read them
+        if not entry or entry['hash'] != hashes[filename] or not entry['chunks']:
+            changed_paths.append(file_path)
+
+    removed_ids = []
+    for filename in set(indexed_files) - set(current_files):
+        logging.info(f"{filename} was removed from the knowledge base, dropping its chunks.")
+        removed_ids.extend(indexed_files.pop(filename)['chunks'])
+
+    stats = IngestStats()
+    batch_docs, batch_ids = [], []
+    kept = 0
+
+    def flush_batch():
+        if not batch_docs:
+            return
+        start = time.perf_counter()
+        embeddings = embedding_manager.generate_embeddings([doc.page_content for doc in batch_docs])
+        stats.embed_seconds += time.perf_counter() - start
+        db.upsert(
+            ids=list(batch_ids),
+            embeddings=np.asarray(embeddings).tolist(),
+            metadatas=[dict(doc.metadata) for doc in batch_docs],
+            documents=[doc.page_content for doc in batch_docs]
+        )
+        if lexical_index is not None:
+            lexical_index.add(batch_ids, [doc.page_content for doc in batch_docs])
+        stats.embedded += len(batch_docs)
+        batch_docs.clear()
+        batch_ids.clear()
+
+    # Changed files are parsed in parallel; their new chunks are embedded in
+    # fixed-size batches as they arrive instead of all at once at the end
+    for file_path, docs, pages in iter_parsed_documents(changed_paths):
+        filename = os.path.basename(file_path)
+        if docs is None:
+            # Keep the file's previous chunks and leave its hash unrecorded, so the next sync retries it
+            logging.info(f"Could not parse {filename}, keeping its previously indexed chunks.")
+            stats.failed += 1
+            continue
+        stats.files += 1
+        stats.pages += pages
+        stats.chunks += len(docs)
+
+        ids = chunk_ids_for(docs)
+        entry = indexed_files.get(filename)
+        previous_ids = set(entry['chunks']) if entry else set()
+
+        kept_ids, kept_metadatas = [], []
+        for chunk_id, doc in zip(ids, docs):
+            if chunk_id in previous_ids:
+                # Same text, possibly new position: refresh metadata only
+                kept_ids.append(chunk_id)
+                kept_metadatas.append(dict(doc.metadata))
+            else:
+                batch_ids.append(chunk_id)
+                batch_docs.append(doc)
+                if len(batch_docs) >= batch_size:
+                    flush_batch()
+        if kept_ids:
+            db.update(ids=kept_ids, metadatas=kept_metadatas)
+            kept += len(kept_ids)
+        removed_ids.extend(previous_ids - set(ids))
+        indexed_files[filename] = {'hash': hashes[filename], 'chunks': ids}
+    flush_batch()
+
+    if removed_ids:
+        logging.info(f"Removing {len(removed_ids)} stale chunks from the vector database...")
+        db.delete(ids=removed_ids)
+
+    if lexical_index is not None:
+        changed = bool(removed_ids or stats.embedded)
+        lexical_index.delete(removed_ids)
+        # Rebuild from the stored chunks if the BM25 file is missing or out of step
+        if len(lexical_index) != sum(len(entry['chunks']) for entry in indexed_files.values()):
+            logging.info("BM25 index out of step with the vector store, rebuilding it.")
+            stored = db.get(include=['documents'])
+            lexical_index.clear()
+            lexical_index.add(stored['ids'], stored['documents'])
+            changed = True
+        if changed:
+            lexical_index.save()
+
+    print(f"Vector index up to date: {stats.embedded} chunks embedded, {len(removed_ids)} removed.")
+    if stats.files or stats.failed:
+        print(stats.report())
+    logging.info(f"Index sync complete: {stats.embedded} embedded, {kept} refreshed, {len(removed_ids)} removed. {stats.report()}")
+
+    save_manifest(manifest)
+    # Serving with an empty index would answer every question from nothing
+    if not any(entry['chunks'] for entry in indexed_files.values()):
+        raise RuntimeError(f"No chunks indexed from {knowledge_base_path} ({len(current_files)} files, "
+                           f"{stats.failed} failed to parse); check the documents and their loaders")
+    return manifest
+
+def open_vector_store(backend: str = VECTOR_BACKEND, read_only: bool = False) -> VectorStore:
+    if backend == 'numpy':
+        return NumpyVectorStore(os.path.join(VECTOR_DB_PATH, 'numpy'), quantize=VECTOR_QUANTIZE, read_only=read_only)
+    if backend != 'chroma':
+        raise ValueError(f"Unknown vector backend '{backend}', expected 'chroma' or 'numpy'")
+
+    import chromadb
     client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
-    
-    docs = load_and_split_data(knowledge_base_path)
-    embeddings = embedding_manager.generate_embeddings([doc.page_content for doc in docs])
-    
-    db = client.get_or_create_collection(
+    return client.get_or_create_collection(
         name='drive_it_policies',
         metadata={'description':'Collection of policy documents for DriveIt RAG system'}
     )
+
+def init_vector_db(knowledge_base_path, backend: str = VECTOR_BACKEND, embedding_manager=None):
+    embedding_manager = embedding_manager or EmbeddingManager()
+    logging.info(f'Initializing vector database ({backend} backend)...')
     
-    ids = [str(1000+i) for i in range(len(docs))]
-    metadatas = [dict(doc.metadata) for doc in docs]
-    
-    logging.info(f"Adding {len(docs)} documents to the vector database...")
-    db.add(
-        ids=ids, 
-        embeddings=embeddings.tolist(), 
-        metadatas=metadatas, 
-        documents=[doc.page_content for doc in docs]
-        )
-        
-    return db, embedding_manager
\ No newline at end of file
+    if not MULTI_WORKER:
+        db = open_vector_store(backend)
+        sync_vector_db(db, embedding_manager, knowledge_base_path, backend,
+                       lexical_index=BM25Index() if HYBRID_RETRIEVAL else None)
+        return db, embedding_manager
+
+    # Workers sync one at a time (all but the first find the index current), then
+    # serve from a read-only memory map that every worker shares through the page cache
+    if backend != 'numpy':
+        raise ValueError(f"MULTI_WORKER needs the numpy vector backend, got '{backend}' (set VECTOR_BACKEND=numpy)")
+    with FileLock(INDEX_LOCK_PATH):
+        db = open_vector_store(backend)
+        sync_vector_db(db, embedding_manager, knowledge_base_path, backend,
+                       lexical_index=BM25Index() if HYBRID_RETRIEVAL else None)
+    return open_vector_store(backend, read_only=True), embedding_manager
\ No newline at end of file
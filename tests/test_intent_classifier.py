@@ -0,0 +1,57 @@
+import pytest
+from src.intent_classifier import FastIntentClassifier
+from src.state import intent_label
+
+DETAILS_PROMPT = "Could you please provide your contact, location to complete your signup for the test drive?"
+
+
+@pytest.fixture
+def classifier():
+    # The rule stage needs no embedding model
+    return FastIntentClassifier(embedding_manager=None)
+
+@pytest.mark.parametrize('message, intent', [
+    ("I want to book a test drive", 'lead'),
+    ("Sure, let's book the test drive", 'lead'),
+    ("If I book a test drive and cancel, do I get a refund?", 'inquiry'),
+    ("What is the price of the Bullet 650?", 'inquiry'),
+    ("my name is Rahul Sharma", 'extract'),
+    ("9876543210", 'extract'),
+    ("+91 98765 43210", 'extract'),
+    ("hello!", 'greeting'),
+])
+def test_rules(classifier, message, intent):
+    assert classifier.classify_by_rules(message)[0] == intent
+
+def test_question_about_booking_is_not_a_lead(classifier):
+    assert classifier.classify_by_rules("Can I reschedule my test drive slot later?")[0] != 'lead'
+
+@pytest.mark.parametrize('message', [
+    "my order number 12345678901 has not arrived",
+    "reference 9876543210123 please check",
+    "I paid 1500000 for it",
+])
+def test_digits_without_phone_context_are_not_extract(classifier, message):
+    assert classifier.classify_by_rules(message)[0] != 'extract'
+
+@pytest.mark.parametrize('message', ["Pune", "rahul@example.com", "9876543210, Mumbai"])
+def test_details_after_details_prompt(classifier, message):
+    intent, confidence = classifier.classify_by_rules(message, DETAILS_PROMPT)
+    assert intent == 'extract' and confidence >= classifier.threshold
+
+@pytest.mark.parametrize('message', ["ok thanks", "not now", "cool", "that is too expensive"])
+def test_short_non_lead_replies_after_details_prompt(classifier, message):
+    intent, confidence = classifier.classify_by_rules(message, DETAILS_PROMPT)
+    assert intent is None and confidence < classifier.threshold
+
+@pytest.mark.parametrize('raw, label', [
+    ("extract", 'extract'),
+    ("Extract.", 'extract'),
+    ("**extract**", 'extract'),
+    ("intent: extract", 'extract'),
+    (" Lead\n", 'lead'),
+    ("product inquiry", 'inquiry'),
+    ("something else", 'greeting'),
+])
+def test_llm_labels_are_normalized(raw, label):
+    assert intent_label(raw) == label
@@ -0,0 +1,28 @@
+from src.lead_extractor import extract_fields, merge_lead_data
+
+
+def test_name_and_city_from_introduction():
+    found = extract_fields("I am Rahul Sharma from Pune")
+    assert found['name'] == 'Rahul Sharma'
+    assert found['location'] == 'Pune'
+
+def test_call_me_on_number_is_not_a_name():
+    found = extract_fields("call me on 9876543210")
+    assert 'name' not in found
+    assert found['contact'] == '9876543210'
+
+def test_this_is_great_is_not_a_name():
+    found = extract_fields("This is great, my number is 9876543210")
+    assert 'name' not in found
+    assert found['contact'] == '9876543210'
+
+def test_contact_turn_keeps_captured_name():
+    lead = merge_lead_data(None, extract_fields("I am Rahul Sharma from Pune"))
+    for message in ("call me on 9876543210", "This is great, my number is 9876543210"):
+        merged = merge_lead_data(lead, extract_fields(message))
+        assert merged == {'name': 'Rahul Sharma', 'contact': '9876543210', 'location': 'Pune'}
+
+def test_only_explicit_name_replaces_captured_name():
+    lead = merge_lead_data(None, extract_fields("I'm Rahul from Pune"))
+    assert merge_lead_data(lead, extract_fields("I'm Rohit"))['name'] == 'Rahul'
+    assert merge_lead_data(lead, extract_fields("Sorry, my name is Rohit"))['name'] == 'Rohit'
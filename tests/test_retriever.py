@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from src.lexical_index import BM25Index
+from src.retriever import RAGRetriever
+
+CHUNKS = {
+    'brakes': ("The Bullet 650 has dual-channel ABS with a 320 mm front disc.", 0.6),
+    'refunds': ("Refunds for a cancelled Bullet 650 booking are paid within 7 days.", 0.1),
+}
+
+
+class FakeStore:
+    """Returns every chunk with the distance its cosine to the query implies (unit vectors)."""
+
+    def query(self, query_embeddings, n_results):
+        ranked = sorted(CHUNKS, key=lambda chunk_id: -CHUNKS[chunk_id][1])[:n_results]
+        return {'ids': [ranked], 'documents': [[CHUNKS[i][0] for i in ranked]],
+                'metadatas': [[{'file_source': 'product_details.txt'} for _ in ranked]],
+                'distances': [[2 - 2 * CHUNKS[i][1] for i in ranked]]}
+
+
+@pytest.fixture
+def lexical_index(tmp_path):
+    index = BM25Index(path=str(tmp_path / 'bm25.json'))
+    index.add(list(CHUNKS), [content for content, _ in CHUNKS.values()])
+    return index
+
+def retrieve(retriever, query):
+    return [chunk['id'] for chunk in retriever.retrieve_chunks(query, query_embedding=np.ones(4))]
+
+def test_off_topic_chunk_is_dropped():
+    retriever = RAGRetriever(FakeStore(), embedding_manager=None, hybrid=False, adaptive=False, min_cosine=0.25)
+    assert retrieve(retriever, "Does the Bullet 650 have ABS?") == ['brakes']
+
+def test_one_shared_common_term_does_not_rescue_off_topic_chunk(lexical_index):
+    # "bullet" and "650" appear in both chunks; only the brakes chunk matches the rest of the query
+    retriever = RAGRetriever(FakeStore(), embedding_manager=None, lexical_index=lexical_index, adaptive=False,
+                             min_cosine=0.25)
+    assert retrieve(retriever, "Does the Bullet 650 have ABS?") == ['brakes']
+
+def test_strong_lexical_match_keeps_low_cosine_chunk(lexical_index):
+    retriever = RAGRetriever(FakeStore(), embedding_manager=None, lexical_index=lexical_index, adaptive=False,
+                             min_cosine=0.25)
+    assert 'refunds' in retrieve(retriever, "refunds for a cancelled booking")
+
+def test_floor_disabled_keeps_everything():
+    retriever = RAGRetriever(FakeStore(), embedding_manager=None, hybrid=False, adaptive=False, min_cosine=None)
+    assert retrieve(retriever, "Does the Bullet 650 have ABS?") == ['brakes', 'refunds']